@@ -6,11 +6,15 @@
 #   R                 : Restart
 #   Q                 : Back to Title
 #
+# python Bomber.py --record run.bmr  records the inputs for bomber_replay.py
+# python Bomber.py --net 0 --port 7700 --peer 127.0.0.1:7701  versus over UDP (bomber_net.py)
+# python Bomber.py --cpu 3  versus against 1-3 CPU players (bomber_bot.py)
 # No external assets. Works on Pyxel 1.9+ (Web OK).
 # Grid-step movement, bombs with chain reactions, destructible blocks, simple enemy AI, two powerups.
 
-import random
-from dataclasses import dataclass
+import atexit
+import os
+import struct
 
 import pyxel
 # === VPAD STARTFIX (release) ===
@@ -37,55 +41,68 @@ PAD_B = _gp("GAMEPAD1_BUTTON_B", 1)
 PAD_X = _gp("GAMEPAD1_BUTTON_X", 2)
 PAD_Y = _gp("GAMEPAD1_BUTTON_Y", 3)
 
-def pressed_or_edge(*codes, grace=3):
-    codes = [c for c in codes if c is not None]
-    return any(pyxel.btnp(c) for c in codes) or (pyxel.frame_count % grace == 0 and any(pyxel.btn(c) for c in codes))
+# START / SELECT / L（SDL 名の BACK / LEFTSHOULDER が現行 Pyxel の定数）
+PAD_START  = _gp("GAMEPAD1_BUTTON_START")
+PAD_SELECT = _gp("GAMEPAD1_BUTTON_SELECT") or _gp("GAMEPAD1_BUTTON_BACK")
+PAD_L      = _gp("GAMEPAD1_BUTTON_SHOULDER_L") or _gp("GAMEPAD1_BUTTON_LEFTSHOULDER")
 # === end VPAD STARTFIX (release) ===
 
 
-# --- Mobile-friendly input bridge (virtual gamepad -> existing keyboard checks) ---
-# 仮想ゲームパッド（GAMEPAD1_...）の入力を、既存のキーボード判定(pyxel.btn/btnp)に合流させる。
-try:
-    _MOBILE_INPUT_MAP = {
-        pyxel.KEY_RIGHT: (pyxel.GAMEPAD1_BUTTON_DPAD_RIGHT,),
-        pyxel.KEY_LEFT:  (pyxel.GAMEPAD1_BUTTON_DPAD_LEFT,),
-        pyxel.KEY_DOWN:  (pyxel.GAMEPAD1_BUTTON_DPAD_DOWN,),
-        pyxel.KEY_UP:    (pyxel.GAMEPAD1_BUTTON_DPAD_UP,),
-        pyxel.KEY_D:     (pyxel.GAMEPAD1_BUTTON_DPAD_RIGHT,),
-        pyxel.KEY_A:     (pyxel.GAMEPAD1_BUTTON_DPAD_LEFT,),
-        pyxel.KEY_S:     (pyxel.GAMEPAD1_BUTTON_DPAD_DOWN,),
-        pyxel.KEY_W:     (pyxel.GAMEPAD1_BUTTON_DPAD_UP,),
-        pyxel.KEY_Z:     (pyxel.GAMEPAD1_BUTTON_A, pyxel.GAMEPAD1_BUTTON_B),
-        pyxel.KEY_SPACE: (pyxel.GAMEPAD1_BUTTON_A,),
-        pyxel.KEY_RETURN:(pyxel.GAMEPAD1_BUTTON_START,),
-        pyxel.KEY_P:     (pyxel.GAMEPAD1_BUTTON_START,),
-        pyxel.KEY_R:     (pyxel.GAMEPAD1_BUTTON_SELECT,),
-        pyxel.KEY_Q:     (pyxel.GAMEPAD1_BUTTON_SHOULDER_L,),
-    }
-    _orig_btn, _orig_btnp = pyxel.btn, pyxel.btnp
-    def _btn(code):  return _orig_btn(code)  or any(_orig_btn(c)  for c in _MOBILE_INPUT_MAP.get(code, ()))
-    def _btnp(code): return _orig_btnp(code) or any(_orig_btnp(c) for c in _MOBILE_INPUT_MAP.get(code, ()))
-    pyxel.btn, pyxel.btnp = _btn, _btnp
-except Exception:
-    # Pyxelバージョン差などでGAMEPAD定数が無い場合はそのまま
-    pass
-# --- end bridge ---
+# --- Input snapshot (keyboard + virtual/real gamepad + mouse, read once per frame) ---
+# 旧版は pyxel.btn/btnp を差し替えて仮想ゲームパッドをキーボード判定に合流させていた。
+# いまは各アクションにキーとパッドの両方を割り当て、FrameInput が毎フレーム1回だけ読む。
+from frame_input import FrameInput
+from frame_profiler import FrameProfiler
+from sound_scheduler import SoundScheduler
+
+ACT_RIGHT   = 1 << 0
+ACT_LEFT    = 1 << 1
+ACT_DOWN    = 1 << 2
+ACT_UP      = 1 << 3
+ACT_BOMB    = 1 << 4   # Z / SPACE / A / B
+ACT_START   = 1 << 5   # タイトルから開始
+ACT_CLICK   = 1 << 6   # マウス左（タッチ）
+ACT_TITLE   = 1 << 7   # Q
+ACT_PAUSE   = 1 << 8   # P
+ACT_RESTART = 1 << 9   # R
+ACT_CONFIRM = 1 << 10  # リザルト画面で続行
+ACT_PROFILE = 1 << 11  # F3: フレーム時間オーバーレイ
+
+INPUT_BINDINGS = {
+    ACT_RIGHT:   (pyxel.KEY_RIGHT, pyxel.KEY_D, PAD_RIGHT),
+    ACT_LEFT:    (pyxel.KEY_LEFT,  pyxel.KEY_A, PAD_LEFT),
+    ACT_DOWN:    (pyxel.KEY_DOWN,  pyxel.KEY_S, PAD_DOWN),
+    ACT_UP:      (pyxel.KEY_UP,    pyxel.KEY_W, PAD_UP),
+    ACT_BOMB:    (pyxel.KEY_Z, pyxel.KEY_SPACE, PAD_A, PAD_B),
+    ACT_START:   (pyxel.KEY_Z, pyxel.KEY_SPACE, pyxel.KEY_RETURN, PAD_A, PAD_B, PAD_X, PAD_Y, PAD_START),
+    ACT_CLICK:   (MOUSE_LEFT,),
+    ACT_TITLE:   (pyxel.KEY_Q, PAD_L),
+    ACT_PAUSE:   (pyxel.KEY_P, PAD_START, PAD_X),
+    ACT_RESTART: (pyxel.KEY_R, PAD_SELECT, PAD_Y),
+    ACT_CONFIRM: (pyxel.KEY_R, pyxel.KEY_Z, pyxel.KEY_SPACE, PAD_SELECT, PAD_A, PAD_B),
+    ACT_PROFILE: (pyxel.KEY_F3,),
+}
+
+# --- end input ---
 
 
 # --------------- Constants ---------------
-TILE = 16
-GRID_W = 13
-GRID_H = 11
-HUD_H = 16
-W = GRID_W * TILE
-H = GRID_H * TILE + HUD_H
-FPS = 60
-
-# Tiles
-EMPTY, WALL, SOFT, PWR_FIRE, PWR_BOMB = 0, 1, 2, 4, 5
-
-# Game states
-TITLE, PLAYING, GAMEOVER, CLEAR = 0, 1, 2, 3
+# Stage logic / constants live in bomber_sim (pyxel-free, headless-capable)
+from bomber_sim import (
+    TILE, GRID_W, GRID_H, HUD_H, W, H, FPS,
+    WALL, SOFT, PWR_FIRE, PWR_BOMB,
+    TITLE, PLAYING, GAMEOVER, CLEAR,
+    EXPLOSION_FRAMES,
+    SND_BOMB, SND_BLAST, SND_PICKUP, SND_HURT, SND_CLEAR,
+    IN_RIGHT, IN_LEFT, IN_DOWN, IN_UP, IN_PRESSED_SHIFT, IN_BOMB, IN_RESTART,
+    BomberSim, clamp, to_pix,
+)
+
+# (sim input bit, action) for the four directions
+DIR_ACTIONS = ((IN_RIGHT, ACT_RIGHT), (IN_LEFT, ACT_LEFT), (IN_DOWN, ACT_DOWN), (IN_UP, ACT_UP))
+
+# 全チャンネルが埋まっている時はこの順で奪う（大きいほど優先）
+SND_PRIORITY = {SND_CLEAR: 4, SND_HURT: 3, SND_BLAST: 2, SND_PICKUP: 1, SND_BOMB: 0}
 
 # Colors (Pyxel palette index)
 COL_BG = 1
@@ -93,6 +110,7 @@ COL_WALL_1 = 5
 COL_WALL_2 = 7
 COL_SOFT = 9
 COL_PLAYER = 10
+PLAYER_COLS = (COL_PLAYER, 11, 6, 15)  # versus: P1..P4
 COL_BOMB = 0
 COL_FIRE = 8
 COL_ENEMY = 14
@@ -103,92 +121,44 @@ COL_SHADOW = 13
 COL_FLOOR_A = 1
 COL_FLOOR_B = 2
 
-# Params
-BOMB_FUSE_FRAMES = FPS * 2          # 2 seconds
-EXPLOSION_FRAMES = int(FPS * 0.35)
-
-# Player grid-step speed (pixels per frame). 16px（1タイル）を 8フレで移動 => 2.0 が目安
-PLAYER_STEP_SPEED = 2.0
-
-ENEMY_SPEED = 1.2
-MAX_ENEMIES = 6
-INITIAL_BOMBS = 1
-INITIAL_POWER = 2
-MAX_BOMBS_CAP = 8
-MAX_POWER_CAP = 8
-
-
-def seed_for(stage):
-    random.seed(1337 + stage * 97)
-
-
-def clamp(v, a, b):
-    return a if v < a else b if v > b else v
-
-
-def in_bounds(tx, ty):
-    return 0 <= tx < GRID_W and 0 <= ty < GRID_H
-
-
-def to_tile(px, py):
-    return int(px // TILE), int((py - HUD_H) // TILE)
-
+# Image bank for the pre-rendered map layer (floor / walls / soft blocks / powerups).
+# The bank is used as a ring buffer of BG_RING x BG_RING tiles around the camera,
+# so arenas larger than the bank scroll without re-painting the whole view.
+BG_BANK = 1
+BG_RING = 256 // TILE
+VIEW_H = GRID_H * TILE  # map view height on screen (below the HUD)
 
-def to_pix(tx, ty, center=True):
-    x = tx * TILE + (TILE // 2 if center else 0)
-    y = ty * TILE + HUD_H + (TILE // 2 if center else 0)
-    return x, y
-
-
-@dataclass
-class Bomb:
-    tx: int
-    ty: int
-    fuse: int
-    power: int
-    owner: str = "player"
-    pass_through_owner: bool = True  # （互換のため残置; 実処理は self.pass_tile で制御）
-
-
-@dataclass
-class Flame:
-    tiles: list  # list[(tx, ty)]
-    timer: int
-
-
-@dataclass
-class Enemy:
-    x: float
-    y: float
-    dirx: int = 0
-    diry: int = 0
-    alive: bool = True
-
-    def rect(self):
-        return (self.x - 6, self.y - 6, self.x + 6, self.y + 6)
-
-
-@dataclass
-class Player:
-    x: float
-    y: float
-    bombs: int = INITIAL_BOMBS
-    power: int = INITIAL_POWER
-    lives: int = 3
-    inv_frames: int = 0
-    alive: bool = True
-
-    def rect(self):
-        return (self.x - 6, self.y - 6, self.x + 6, self.y + 6)
+# Optional pre-generated stage bank (python bomber_stagebank.py). Used when present.
+STAGE_BANK = "bomber_stages.bin"
 
 
 class Game:
-    def __init__(self):
+    def __init__(self, arena=None, record=None, net=None, cpu=0):
         pyxel.init(W, H, title="Bomber-Pyxel [REL-2025-08-15e]", fps=FPS, display_scale=3)
         self.state = TITLE
         self.stage = 1
+        self.inp = FrameInput(INPUT_BINDINGS)
+        self.prof = FrameProfiler(key=None)  # F3 は FrameInput 経由で読む
+        self.arena = arena or (GRID_W, GRID_H)  # 大きくするとカメラがスクロール（最大 255x255）
+        if self.arena[0] < GRID_W or self.arena[1] < GRID_H:
+            raise ValueError(f"arena must be at least {GRID_W}x{GRID_H} tiles (the screen size)")
+        self.bank = self._open_stage_bank()
+        self.recorder = None
+        if record:
+            from bomber_replay import Recorder
+            self.recorder = Recorder(record)
+            atexit.register(self.recorder.close)
+        self.session = None
+        self.bots = []
+        self.versus_status = PLAYING
+        self.me = 0  # 自分の player 番号（カメラと HUD 用）
         self._init_sounds()
+        self.audio = SoundScheduler(SND_PRIORITY, fps=FPS)
         self.reset_stage()
+        if net:
+            self._start_versus(*net)
+        elif cpu:
+            self._start_cpu_versus(cpu)
         pyxel.run(self.update, self.draw)
 
     # --------------- Setup ---------------
@@ -200,77 +170,66 @@ class Game:
         pyxel.sounds[3].set("C2",        "N", "7",    "N", 8)
         pyxel.sounds[4].set("C4E4G4C4",  "P", "7777", "N", 12)  # ← C5→C4
 
+    def _open_stage_bank(self):
+        # バンクが無い（Web 版など）ときは従来どおりその場で生成する
+        path = os.path.join(os.path.dirname(os.path.abspath(__file__)), STAGE_BANK)
+        if not os.path.exists(path):
+            return None
+        from bomber_stagebank import StageBank
+        try:
+            return StageBank(path)
+        except (OSError, ValueError, struct.error):  # 壊れた / 途中で切れたファイル
+            return None
+
     def reset_stage(self):
-        self.frame = 0
         self.pause = False
-        seed_for(self.stage)
-        self.map = [[EMPTY for _ in range(GRID_H)] for _ in range(GRID_W)]
-        self._make_walls()
-        self._place_soft_blocks()
-        self.explosions = []
-        self.bombs = []
-        self.player = Player(*to_pix(1, 1))
-        self._clear_spawn_area()
-        self.enemies = self._spawn_enemies()
         self.title_blink = 0
-
-        # 爆弾すり抜けフラグ（自分が置いた直後のタイル）
-        self.pass_tile = None
-
-        # --- Grid-step movement state ---
-        self.p_moving = False          # 現在、タイル間を移動中か
-        self.p_dirx = 0                # 移動方向（-1/0/1）
-        self.p_diry = 0
-        self.p_target_x = self.player.x  # 目標ピクセル座標（タイルセンター）
-        self.p_target_y = self.player.y
-
-    def _make_walls(self):
-        for x in range(GRID_W):
-            for y in range(GRID_H):
-                if x == 0 or y == 0 or x == GRID_W - 1 or y == GRID_H - 1:
-                    self.map[x][y] = WALL
-                elif x % 2 == 0 and y % 2 == 0:
-                    self.map[x][y] = WALL
-
-    def _place_soft_blocks(self):
-        for x in range(GRID_W):
-            for y in range(GRID_H):
-                if self.map[x][y] != EMPTY:
-                    continue
-                if random.random() < 0.70:
-                    self.map[x][y] = SOFT
-
-    def _clear_spawn_area(self):
-        for dx, dy in [(0,0),(1,0),(0,1),(1,1),(2,1),(1,2)]:
-            tx, ty = 1 + dx, 1 + dy
-            if in_bounds(tx, ty) and self.map[tx][ty] == SOFT:
-                self.map[tx][ty] = EMPTY
-
-    def _spawn_enemies(self):
-        spots = []
-        for x in range(1, GRID_W - 1):
-            for y in range(1, GRID_H - 1):
-                if self.map[x][y] == EMPTY and (x + y) > 6:
-                    spots.append((x, y))
-        random.shuffle(spots)
-        n = clamp(3 + self.stage // 2, 3, MAX_ENEMIES)
-        enemies = []
-        for i in range(min(n, len(spots))):
-            px, py = to_pix(*spots[i])
-            e = Enemy(px, py, *random.choice([(1,0),(-1,0),(0,1),(0,-1)]))
-            enemies.append(e)
-        return enemies
+        self.sim = BomberSim(self.stage, size=self.arena, bank=self.bank)
+        self.sim.prof = self.prof
+        self._bg_map = None   # マップレイヤーを焼いた時の sim.map
+        self._bg_rect = None  # リングバッファに描いてあるタイル範囲 (tx0, ty0, tx1, ty1)
+        if self.recorder:
+            self.recorder.begin(self.sim)
+
+    def _start_versus(self, player, port, peers):
+        # 対戦モード: ステージは1つだけで、リスタートも入力（IN_RESTART）として全員に配る。
+        # ローカルで sim を作り直すと同期が崩れるので、タイトル / ポーズ / リザルト画面は使わない
+        from bomber_net import RollbackSession, UdpTransport
+        addrs = {p if p < player else p + 1: addr for p, addr in enumerate(peers)}
+        self.sim = BomberSim(self.stage, size=self.arena, players=len(peers) + 1)
+        self.sim.prof = self.prof
+        self._bg_map = None
+        self.session = RollbackSession(self.sim, player, UdpTransport(port, addrs))
+        atexit.register(self.session.transport.close)
+        self.me = player
+        self.state = PLAYING
+
+    def _start_cpu_versus(self, n):
+        # ローカル対戦: P1 が自分、P2.. は bomber_bot.Bot
+        from bomber_bot import Bot
+        self.sim = BomberSim(self.stage, size=self.arena, players=n + 1)
+        self.sim.prof = self.prof
+        self._bg_map = None
+        self.bots = [Bot(self.sim, i + 1, seed=i) for i in range(n)]
+        self.state = PLAYING
 
     # --------------- Update Loop ---------------
     def update(self):
+        inp = self.inp
+        self.prof.begin()
+        inp.poll()
+        if inp.btnp(ACT_PROFILE):
+            self.prof.toggle()
+        if self.session or self.bots:
+            self.update_versus()
+            return
 
         # --- GLOBAL EARLY START (release) ---
         try:
             _is_title = (getattr(self, "state", None) == TITLE) or (getattr(self, "mode", None) == TITLE) or (getattr(self, "scene", None) == TITLE) or (getattr(self, "game_state", None) == TITLE)
         except Exception:
             _is_title = False
-        if _is_title and (pressed_or_edge(pyxel.KEY_Z, pyxel.KEY_SPACE, pyxel.KEY_RETURN, PAD_A, PAD_B, PAD_X, PAD_Y) \
-                         or (MOUSE_LEFT is not None and pyxel.btnp(MOUSE_LEFT))):
+        if _is_title and (inp.pressed_or_edge(ACT_START) or inp.btnp(ACT_CLICK)):
             try:
                 self.state = PLAYING
             except Exception:
@@ -283,13 +242,13 @@ class Game:
                         pass
             return
         # --- END GLOBAL EARLY START (release) ---
-        if pyxel.btnp(pyxel.KEY_Q):
+        if inp.btnp(ACT_TITLE):
             self.state = TITLE
 
         if self.state == TITLE:
             self.update_title()
         elif self.state == PLAYING:
-            if pressed_or_edge(pyxel.KEY_P, PAD_X):
+            if inp.pressed_or_edge(ACT_PAUSE):
                 self.pause = not self.pause
             if self.pause:
                 return
@@ -298,10 +257,10 @@ class Game:
             self.update_result()
 
     def update_title(self):
+        inp = self.inp
 
         # --- EARLY START (release) ---
-        if pressed_or_edge(pyxel.KEY_Z, pyxel.KEY_SPACE, pyxel.KEY_RETURN, PAD_A, PAD_B, PAD_X, PAD_Y) \
-           or (MOUSE_LEFT is not None and pyxel.btnp(MOUSE_LEFT)):
+        if inp.pressed_or_edge(ACT_START) or inp.btnp(ACT_CLICK):
             try:
                 self.state = PLAYING
             except Exception:
@@ -315,311 +274,72 @@ class Game:
             return
         # --- END EARLY START ---
         self.title_blink = (self.title_blink + 1) % FPS
-        if pyxel.btnp(pyxel.KEY_Z) or pyxel.btnp(pyxel.KEY_SPACE) or pyxel.btnp(pyxel.KEY_RETURN):
+        if inp.btnp(ACT_START):
             self.state = PLAYING
-        if pressed_or_edge(pyxel.KEY_R, PAD_Y):
+        if inp.pressed_or_edge(ACT_RESTART):
             self.stage = 1
             self.reset_stage()
 
     def update_result(self):
-        if pyxel.btnp(pyxel.KEY_R) or pyxel.btnp(pyxel.KEY_Z) or pyxel.btnp(pyxel.KEY_SPACE):
+        if self.inp.btnp(ACT_CONFIRM):
             if self.state == CLEAR:
                 self.stage += 1
             self.reset_stage()
             self.state = PLAYING
 
     def update_playing(self):
-        self.frame += 1
-        if pressed_or_edge(pyxel.KEY_R, PAD_Y):
-            self.reset_stage()
-            return
-        if pressed_or_edge(pyxel.KEY_Z, pyxel.KEY_SPACE, PAD_A, PAD_B):
-            self._place_bomb()
-
-        self._update_player_gridstep()
-        self._update_bombs_and_flames()
-        self._update_enemies()
-
-        if self.player.lives <= 0:
-            self.state = GAMEOVER
-        elif all(not e.alive for e in self.enemies):
-            self.state = CLEAR
-            pyxel.play(0, 4)
-
-    # --------------- Player (grid-step) ---------------
-    def _is_solid_tile(self, tx, ty):
-        return not in_bounds(tx, ty) or self.map[tx][ty] == WALL
-
-    def _is_blocking_tile(self, tx, ty):
-        if not in_bounds(tx, ty):
-            return True
-        if self.map[tx][ty] in (WALL, SOFT):
-            return True
-        for b in self.bombs:
-            if b.tx == tx and b.ty == ty:
-                return True
-        return False
-
-    def _bomb_at(self, tx, ty):
-        for b in self.bombs:
-            if b.tx == tx and b.ty == ty:
-                return b
-        return None
-
-    def _read_dir_priority(self):
-        # まず「押された瞬間(btnp)」を優先、なければ「押されている(btn)」順で採用
-        choices = [
-            ((1,0), (pyxel.KEY_RIGHT, pyxel.KEY_D, PAD_RIGHT)),
-            ((-1,0), (pyxel.KEY_LEFT,  pyxel.KEY_A, PAD_LEFT)),
-            ((0,1),  (pyxel.KEY_DOWN,  pyxel.KEY_S, PAD_DOWN)),
-            ((0,-1), (pyxel.KEY_UP,    pyxel.KEY_W, PAD_UP)),
-        ]
-        # btnp 優先
-        for (dx,dy), keys in choices:
-            if any((k is not None and pyxel.btnp(k)) for k in keys):
-                return dx, dy
-        # btn のフォールバック
-        for (dx,dy), keys in choices:
-            if any((k is not None and pyxel.btn(k)) for k in keys):
-                return dx, dy
-        return 0, 0
-
-    def _start_step_if_possible(self, dx, dy):
-        if dx == 0 and dy == 0:
-            return False
-        tx, ty = to_tile(self.player.x, self.player.y)
-        ntx, nty = tx + dx, ty + dy
-        if not in_bounds(ntx, nty):
-            return False
-        if self._is_blocking_tile(ntx, nty):
-            return False
-        self.p_moving = True
-        self.p_dirx, self.p_diry = dx, dy
-        self.p_target_x, self.p_target_y = to_pix(ntx, nty)
-        return True
-
-    def _update_player_gridstep(self):
-        # すり抜け解除：プレイヤー矩形が爆弾タイル矩形と重ならなくなったら解除
-        if self.pass_tile:
-            txp, typ = self.pass_tile
-            x0r, y0r, x1r, y1r = self.player.x - 6, self.player.y - 6, self.player.x + 6, self.player.y + 6
-            bx0, by0 = txp * TILE, typ * TILE + HUD_H
-            bx1, by1 = bx0 + TILE, by0 + TILE
-            if (x1r <= bx0 or x0r >= bx1 or y1r <= by0 or y0r >= by1):
-                self.pass_tile = None
-
-        # 現在タイル中心かを確認（誤差吸収のため丸め）
-        tx, ty = to_tile(self.player.x, self.player.y)
-        cx, cy = to_pix(tx, ty)
-        if abs(self.player.x - cx) < 0.5 and abs(self.player.y - cy) < 0.5:
-            self.player.x, self.player.y = cx, cy
-            at_center = True
-        else:
-            at_center = False
-
-        # 次の一歩を開始（中心にいる＆停止中のときにのみ方向入力を読む）
-        if not self.p_moving and at_center:
-            dx, dy = self._read_dir_priority()
-            self._start_step_if_possible(dx, dy)
-
-        # 移動中なら目標センターへ直進
-        if self.p_moving:
-            spd = PLAYER_STEP_SPEED
-            if self.p_dirx != 0:
-                nxt = self.player.x + self.p_dirx * spd
-                if (self.p_dirx > 0 and nxt >= self.p_target_x) or (self.p_dirx < 0 and nxt <= self.p_target_x):
-                    self.player.x = self.p_target_x
-                    self.p_moving = False
-                else:
-                    self.player.x = nxt
-            elif self.p_diry != 0:
-                nyt = self.player.y + self.p_diry * spd
-                if (self.p_diry > 0 and nyt >= self.p_target_y) or (self.p_diry < 0 and nyt <= self.p_target_y):
-                    self.player.y = self.p_target_y
-                    self.p_moving = False
-                else:
-                    self.player.y = nyt
-
-            # タイルに到達した瞬間、同じ方向が押されていれば自動で次の一歩を開始
-            if not self.p_moving:
-                dx, dy = self._read_dir_priority()
-                # 同方向が押されているなら連続ステップ（押しっぱなし歩き）
-                if (dx, dy) == (self.p_dirx, self.p_diry):
-                    if not self._start_step_if_possible(dx, dy):
-                        self.p_dirx = self.p_diry = 0
-                else:
-                    # 別方向入力があればそちらを優先（L字ターン）
-                    if not self._start_step_if_possible(dx, dy):
-                        self.p_dirx = self.p_diry = 0
-
-        # ピックアップ判定（タイルベースでOK）
-        ptx, pty = to_tile(self.player.x, self.player.y)
-        tile = self.map[ptx][pty]
-        if tile == PWR_BOMB:
-            self.map[ptx][pty] = EMPTY
-            self.player.bombs = min(MAX_BOMBS_CAP, self.player.bombs + 1)
-            pyxel.play(0, 2)
-        elif tile == PWR_FIRE:
-            self.map[ptx][pty] = EMPTY
-            self.player.power = min(MAX_POWER_CAP, self.player.power + 1)
-            pyxel.play(0, 2)
-
-        # 炎ダメージ
-        if self.player.inv_frames > 0:
-            self.player.inv_frames -= 1
-        else:
-            if self._tile_in_flame(ptx, pty):
-                self.player.lives -= 1
-                self.player.inv_frames = FPS
-                pyxel.play(0, 3)
-                self.player.x, self.player.y = to_pix(1, 1)
-                # 移動状態をリセット
-                self.p_moving = False
-                self.p_dirx = self.p_diry = 0
-                self.p_target_x, self.p_target_y = self.player.x, self.player.y
-
-    # --------------- Bombs / Explosions ---------------
-    def _place_bomb(self):
-        # 自分が設置可能上限まで
-        if len([b for b in self.bombs if b.owner == "player"]) >= self.player.bombs:
-            return
-        tx, ty = to_tile(self.player.x, self.player.y)
-        if self._is_solid_tile(tx, ty) or self._bomb_at(tx, ty):
-            return
-        self.bombs.append(Bomb(tx, ty, BOMB_FUSE_FRAMES, self.player.power, "player", True))
-        self.pass_tile = (tx, ty)  # 設置タイル在室中はすり抜け
-        pyxel.play(0, 0)
-
-    def _explode(self, bomb: Bomb):
-        tiles = [(bomb.tx, bomb.ty)]
-        for dx, dy in [(1,0),(-1,0),(0,1),(0,-1)]:
-            for r in range(1, bomb.power + 1):
-                tx, ty = bomb.tx + dx * r, bomb.ty + dy * r
-                if not in_bounds(tx, ty):
-                    break
-                if self.map[tx][ty] == WALL:
-                    break
-                tiles.append((tx, ty))
-                if self.map[tx][ty] == SOFT:
-                    break
-
-        self.explosions.append(Flame(tiles, EXPLOSION_FRAMES))
-        pyxel.play(0, 1)
-
-        # Destroy soft blocks and maybe spawn powerups
-        for tx, ty in tiles:
-            if in_bounds(tx, ty) and self.map[tx][ty] == SOFT:
-                roll = random.random()
-                if roll < 0.06:
-                    self.map[tx][ty] = PWR_BOMB
-                elif roll < 0.12:
-                    self.map[tx][ty] = PWR_FIRE
-                else:
-                    self.map[tx][ty] = EMPTY
-
-        # Chain reaction
-        to_detonate = []
-        for other in self.bombs:
-            if other is bomb:
-                continue
-            for tx, ty in tiles:
-                if other.tx == tx and other.ty == ty:
-                    to_detonate.append(other)
-                    break
-        for ob in to_detonate:
-            if ob in self.bombs:
-                self.bombs.remove(ob)
-                self._explode(ob)
-
-    def _tile_in_flame(self, tx, ty):
-        for f in self.explosions:
-            if (tx, ty) in f.tiles:
-                return True
-        return False
-
-    def _update_bombs_and_flames(self):
-        # Fuse
-        for b in list(self.bombs):
-            b.fuse -= 1
-            if b.fuse <= 0:
-                self.bombs.remove(b)
-                self._explode(b)
-        # Flames
-        for f in list(self.explosions):
-            f.timer -= 1
-            if f.timer <= 0:
-                self.explosions.remove(f)
-
-    # --------------- Enemies ---------------
-    def _rect_vs_blocking(self, x0, y0, x1, y1):
-        min_tx, min_ty = to_tile(x0, y0)
-        max_tx, max_ty = to_tile(x1, y1)
-        for tx in range(min_tx, max_tx + 1):
-            for ty in range(min_ty, max_ty + 1):
-                if self._is_blocking_tile(tx, ty):
-                    bx0, by0 = tx * TILE, ty * TILE + HUD_H
-                    bx1, by1 = bx0 + TILE, by0 + TILE
-                    if not (x1 <= bx0 or x0 >= bx1 or y1 <= by0 or y0 >= by1):
-                        return True
-        return False
-
-    def _update_enemies(self):
-        for e in self.enemies:
-            if not e.alive:
-                continue
-            tx, ty = to_tile(e.x, e.y)
-            if self._tile_in_flame(tx, ty):
-                e.alive = False
-                continue
-
-            cx, cy = to_pix(tx, ty)
-            at_center = abs(e.x - cx) < 1 and abs(e.y - cy) < 1
-            spd = ENEMY_SPEED
-
-            if at_center:
-                e.x, e.y = cx, cy
-                choices = []
-                for dx, dy in [(1,0),(-1,0),(0,1),(0,-1)]:
-                    ntx, nty = tx + dx, ty + dy
-                    if not in_bounds(ntx, nty):
-                        continue
-                    if self._is_blocking_tile(ntx, nty):
-                        continue
-                    choices.append((dx, dy))
-                if (e.dirx, e.diry) in choices and random.random() < 0.7:
-                    pass
-                else:
-                    if choices:
-                        e.dirx, e.diry = random.choice(choices)
-
-            nx = e.x + e.dirx * spd
-            ny = e.y
-            if not self._rect_vs_blocking(nx - 6, ny - 6, nx + 6, ny + 6):
-                e.x = nx
-            nx = e.x
-            ny = e.y + e.diry * spd
-            if not self._rect_vs_blocking(nx - 6, ny - 6, nx + 6, ny + 6):
-                e.y = ny
-
-        # Touch damage
-        for e in self.enemies:
-            if not e.alive:
-                continue
-            if self.player.inv_frames == 0:
-                px0, py0, px1, py1 = self.player.rect()
-                ex0, ey0, ex1, ey1 = e.rect()
-                if not (px1 < ex0 or px0 > ex1 or py1 < ey0 or py0 > ey1):
-                    self.player.lives -= 1
-                    self.player.inv_frames = FPS
-                    pyxel.play(0, 3)
-                    self.player.x, self.player.y = to_pix(1, 1)
-                    # 移動状態リセット
-                    self.p_moving = False
-                    self.p_dirx = self.p_diry = 0
-                    self.p_target_x, self.p_target_y = self.player.x, self.player.y
+        inp = self._read_input()
+        self.prof.lap("input")
+        status = self.sim.tick(inp)
+        if self.recorder:
+            self.recorder.frame(inp)
+        self.audio.extend(self.sim.sounds)
+        self.sim.sounds.clear()
+        self.audio.flush()
+        if status != PLAYING:
+            self.state = status
+
+    def update_versus(self):
+        # 巻き戻し中に鳴った音は session が捨てるので、ここに残っているのは新しいフレームの分だけ
+        inp = self._read_input()
+        self.prof.lap("input")
+        if self.versus_status != PLAYING:
+            # 決着後はリマッチ（IN_RESTART）だけを通す。session は全員同じフレームで戻すため進め続ける
+            inp &= IN_RESTART
+        if self.session:
+            self.session.advance(inp)
+            self.versus_status = self.session.status
+        elif self.versus_status == PLAYING:
+            self.versus_status = self.sim.tick([inp] + [b.input() for b in self.bots])
+        elif inp:
+            self.versus_status = self.sim.tick([inp] + [0] * len(self.bots))
+        self.audio.extend(self.sim.sounds)
+        self.sim.sounds.clear()
+        self.audio.flush()
+
+    def _read_input(self):
+        # 入力スナップショットをシミュレーション用のビットマスクに変換（sim 側は pyxel 非依存）
+        snap = self.inp
+        inp = 0
+        for bit, act in DIR_ACTIONS:
+            if snap.held & act:
+                inp |= bit
+            if snap.pressed & act:
+                inp |= bit << IN_PRESSED_SHIFT
+        if snap.pressed_or_edge(ACT_RESTART):
+            inp |= IN_RESTART
+        if snap.pressed_or_edge(ACT_BOMB):
+            inp |= IN_BOMB
+        return inp
 
     # --------------- Draw ---------------
     def draw(self):
+        self.prof.resume()
+        self._draw_screen()
+        self.prof.lap("hud")
+        self.prof.draw_overlay()
+
+    def _draw_screen(self):
         pyxel.cls(COL_BG)
         if self.state == TITLE:
             self.draw_title()
@@ -627,7 +347,12 @@ class Game:
 
         self.draw_game()
 
-        if self.state == GAMEOVER:
+        if self.session or self.bots:
+            if self.versus_status != PLAYING:
+                w = self.sim.winner
+                label = f"PLAYER {w + 1} WINS" if w >= 0 else "DRAW"
+                self._draw_center_label(f"{label} - R:Rematch", PLAYER_COLS[max(w, 0)])
+        elif self.state == GAMEOVER:
             self._draw_center_label("GAME OVER - R:Retry / Q:Title", COL_ENEMY)
         elif self.state == CLEAR:
             self._draw_center_label("STAGE CLEAR! - Z/R to Continue", COL_PLAYER)
@@ -649,47 +374,44 @@ class Game:
         self._shadow_text(16, 120, "ARROWS/WASD: MOVE (grid step)", 6)
         self._shadow_text(16, 130, "Z/SPACE: BOMB, P: PAUSE, R: RESTART, Q: TITLE", 6)
 
+    def _camera(self):
+        # プレイヤー中心。アリーナ端で止める（標準サイズでは常に 0, 0）
+        sim = self.sim
+        p = sim.players[self.me]
+        cam_x = clamp(int(p.x) - W // 2, 0, sim.gw * TILE - W)
+        cam_y = clamp(int(p.y) - HUD_H - VIEW_H // 2, 0, sim.gh * TILE - VIEW_H)
+        return cam_x, cam_y
+
     def draw_game(self):
-        # HUD
-        pyxel.rect(0, 0, W, HUD_H, 1)
-        self._shadow_text(4, 4, f"STAGE {self.stage}", COL_UI)
-        self._shadow_text(80, 4, f"LIVES {self.player.lives}", 8)
-        self._shadow_text(140, 4, f"BOMB {self.player.bombs}", 12)
-        self._shadow_text(190, 4, f"FIRE {self.player.power}", 9)
-
-        # Map
-        for x in range(GRID_W):
-            for y in range(GRID_H):
-                px, py = x * TILE, y * TILE + HUD_H
-                t = self.map[x][y]
-                if t == WALL:
-                    c = COL_WALL_2 if (x + y) % 2 == 0 else COL_WALL_1
-                    pyxel.rect(px, py, TILE, TILE, c)
-                    pyxel.rect(px, py + TILE - 3, TILE, 3, max(0, c - 1))
-                elif t == SOFT:
-                    pyxel.rect(px + 1, py + 1, TILE - 2, TILE - 2, COL_SOFT)
-                    pyxel.rect(px + 1, py + TILE - 4, TILE - 2, 3, COL_SHADOW)
-                elif t == PWR_BOMB:
-                    pyxel.rect(px + 3, py + 3, TILE - 6, TILE - 6, 2)
-                    self._pixel_plus(px + 8, py + 8, 7)
-                elif t == PWR_FIRE:
-                    pyxel.circ(px + 8, py + 8, 6, 9)
-                    pyxel.circb(px + 8, py + 8, 6, 7)
-                else:
-                    c = COL_FLOOR_A if (x + y) % 2 == 0 else COL_FLOOR_B
-                    pyxel.rect(px, py, TILE, TILE, c)
+        sim = self.sim
+        cam_x, cam_y = self._camera()
+        # 見えているタイル範囲（+1 マスの余白）
+        tx0, ty0 = cam_x // TILE, cam_y // TILE
+        tx1 = min(sim.gw - 1, (cam_x + W - 1) // TILE)
+        ty1 = min(sim.gh - 1, (cam_y + VIEW_H - 1) // TILE)
+
+        # Map（静的レイヤーを blt で描画。変化したタイルだけ描き直す）
+        self._sync_map_layer(tx0, ty0, tx1, ty1)
+        self._blt_map_layer(cam_x, cam_y)
+        self.prof.lap("map")
+
+        pyxel.camera(cam_x, cam_y)
 
         # Bombs
-        for b in self.bombs:
+        for b in sim.bombs:
+            if not (tx0 - 1 <= b.tx <= tx1 + 1 and ty0 - 1 <= b.ty <= ty1 + 1):
+                continue
             bx, by = to_pix(b.tx, b.ty)
             pyxel.circ(bx, by, 5, COL_BOMB)
             if (b.fuse // 6) % 2 == 0:
                 pyxel.pset(bx + 3, by - 4, 7)
 
         # Flames
-        for f in self.explosions:
-            alpha = clamp(int(7 * (f.timer / EXPLOSION_FRAMES)), 2, 7)
+        for f in sim.explosions:
+            alpha = clamp(int(7 * ((f.until - sim.flame_now) / EXPLOSION_FRAMES)), 2, 7)
             for (tx, ty) in f.tiles:
+                if not (tx0 - 1 <= tx <= tx1 + 1 and ty0 - 1 <= ty <= ty1 + 1):
+                    continue
                 cx, cy = to_pix(tx, ty)
                 cx, cy = int(cx), int(cy)
                 pyxel.rect(cx - 6, cy - 2, 12, 4, COL_FIRE)  # horizontal
@@ -697,22 +419,96 @@ class Game:
                 pyxel.circb(cx, cy, 7, alpha)
 
         # Enemies
-        for e in self.enemies:
-            if not e.alive:
+        x0, x1 = cam_x - TILE, cam_x + W + TILE
+        y0, y1 = cam_y + HUD_H - TILE, cam_y + HUD_H + VIEW_H + TILE
+        for e in sim.enemies:
+            if not e.alive or not (x0 <= e.x <= x1 and y0 <= e.y <= y1):
                 continue
             pyxel.circ(int(e.x), int(e.y), 6, COL_ENEMY)
             pyxel.pset(int(e.x) - 2, int(e.y) - 2, 0)
             pyxel.pset(int(e.x) + 2, int(e.y) - 2, 0)
 
-        # Player
-        if self.player.alive:
-            blink = (self.player.inv_frames // 3) % 2 == 1
-            if not blink:
-                px, py = int(self.player.x), int(self.player.y)
-                pyxel.circ(px, py, 6, COL_PLAYER)
-                pyxel.pset(px - 2, py - 2, 0)
-                pyxel.pset(px + 2, py - 2, 0)
-                pyxel.rect(px - 2, py + 2, 4, 1, 0)
+        # Players
+        for p in sim.players:
+            if not p.alive or (p.inv_frames // 3) % 2 == 1:
+                continue
+            px, py = int(p.x), int(p.y)
+            pyxel.circ(px, py, 6, PLAYER_COLS[p.idx])
+            pyxel.pset(px - 2, py - 2, 0)
+            pyxel.pset(px + 2, py - 2, 0)
+            pyxel.rect(px - 2, py + 2, 4, 1, 0)
+
+        pyxel.camera()
+        self.prof.lap("sprites")
+
+        # HUD（スクロール時にはみ出した敵などを隠すため最後に描く）
+        pyxel.rect(0, 0, W, HUD_H, 1)
+        if sim.versus:
+            for p in sim.players:
+                self._shadow_text(4 + p.idx * 52, 4, f"P{p.idx + 1} LIVES {p.lives}", PLAYER_COLS[p.idx])
+            return
+        self._shadow_text(4, 4, f"STAGE {self.stage}", COL_UI)
+        self._shadow_text(80, 4, f"LIVES {sim.player.lives}", 8)
+        self._shadow_text(140, 4, f"BOMB {sim.player.bombs}", 12)
+        self._shadow_text(190, 4, f"FIRE {sim.player.power}", 9)
+
+    # --------------- Map layer ---------------
+    def _sync_map_layer(self, tx0, ty0, tx1, ty1):
+        # リングバッファ（タイル (x, y) -> バンク上 (x % BG_RING, y % BG_RING)）を
+        # 見えている範囲に合わせる。新しく見えたタイルと sim.dirty_tiles だけを描く。
+        sim = self.sim
+        img = pyxel.images[BG_BANK]
+        if self._bg_map is not sim.map:
+            self._bg_map = sim.map
+            self._bg_rect = None
+            sim.dirty_tiles.clear()
+        old = self._bg_rect
+        new = (tx0, ty0, tx1, ty1)
+        if old != new:
+            for x in range(tx0, tx1 + 1):
+                for y in range(ty0, ty1 + 1):
+                    if old is None or not (old[0] <= x <= old[2] and old[1] <= y <= old[3]):
+                        self._paint_tile(img, x, y, sim.map.get(x, y))
+            self._bg_rect = new
+        if sim.dirty_tiles:
+            for x, y in sim.dirty_tiles:
+                # 範囲外のタイルは、見えた時に描かれる
+                if tx0 <= x <= tx1 and ty0 <= y <= ty1:
+                    self._paint_tile(img, x, y, sim.map.get(x, y))
+            sim.dirty_tiles.clear()
+
+    def _blt_map_layer(self, cam_x, cam_y):
+        # バンク端で折り返す部分は分割して転送（標準サイズでは 1 回）
+        size = BG_RING * TILE
+        v, sy, h = cam_y % size, HUD_H, VIEW_H
+        while h > 0:
+            hh = min(h, size - v)
+            u, sx, w = cam_x % size, 0, W
+            while w > 0:
+                ww = min(w, size - u)
+                pyxel.blt(sx, sy, BG_BANK, u, v, ww, hh)
+                sx, w, u = sx + ww, w - ww, 0
+            sy, h, v = sy + hh, h - hh, 0
+
+    def _paint_tile(self, img, x, y, t):
+        px, py = (x % BG_RING) * TILE, (y % BG_RING) * TILE
+        img.rect(px, py, TILE, TILE, COL_BG)
+        if t == WALL:
+            c = COL_WALL_2 if (x + y) % 2 == 0 else COL_WALL_1
+            img.rect(px, py, TILE, TILE, c)
+            img.rect(px, py + TILE - 3, TILE, 3, max(0, c - 1))
+        elif t == SOFT:
+            img.rect(px + 1, py + 1, TILE - 2, TILE - 2, COL_SOFT)
+            img.rect(px + 1, py + TILE - 4, TILE - 2, 3, COL_SHADOW)
+        elif t == PWR_BOMB:
+            img.rect(px + 3, py + 3, TILE - 6, TILE - 6, 2)
+            self._pixel_plus(px + 8, py + 8, 7, img)
+        elif t == PWR_FIRE:
+            img.circ(px + 8, py + 8, 6, 9)
+            img.circb(px + 8, py + 8, 6, 7)
+        else:
+            c = COL_FLOOR_A if (x + y) % 2 == 0 else COL_FLOOR_B
+            img.rect(px, py, TILE, TILE, c)
 
     # --------------- Draw helpers ---------------
     def _draw_center_label(self, text, color):
@@ -723,13 +519,28 @@ class Game:
         pyxel.text(x + 1, y + 1, s, 0)
         pyxel.text(x, y, s, c)
 
-    def _pixel_plus(self, x, y, c):
-        pyxel.pset(x, y, c)
-        pyxel.pset(x + 1, y, c)
-        pyxel.pset(x - 1, y, c)
-        pyxel.pset(x, y + 1, c)
-        pyxel.pset(x, y - 1, c)
+    def _pixel_plus(self, x, y, c, img=pyxel):
+        img.pset(x, y, c)
+        img.pset(x + 1, y, c)
+        img.pset(x - 1, y, c)
+        img.pset(x, y + 1, c)
+        img.pset(x, y - 1, c)
 
 
 if __name__ == "__main__":
-    Game()
\ No newline at end of file
+    import sys
+    arena = None
+    if "--arena" in sys.argv:  # 例: python Bomber.py --arena 63x63
+        aw, ah = sys.argv[sys.argv.index("--arena") + 1].lower().split("x")
+        arena = (int(aw), int(ah))
+    record = None
+    if "--record" in sys.argv:  # 例: python Bomber.py --record run.bmr
+        record = sys.argv[sys.argv.index("--record") + 1]
+    net = None
+    if "--net" in sys.argv:  # 例: python Bomber.py --net 0 --port 7700 --peer 127.0.0.1:7701
+        from bomber_net import parse_peer
+        port = int(sys.argv[sys.argv.index("--port") + 1]) if "--port" in sys.argv else 7700
+        peers = [parse_peer(sys.argv[i + 1]) for i, a in enumerate(sys.argv) if a == "--peer"]
+        net = (int(sys.argv[sys.argv.index("--net") + 1]), port, peers)
+    cpu = int(sys.argv[sys.argv.index("--cpu") + 1]) if "--cpu" in sys.argv else 0  # 例: --cpu 3
+    Game(arena, record, net, cpu)
\ No newline at end of file
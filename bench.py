@@ -0,0 +1,293 @@
+# Scenario benchmarks for the four games (headless)
+#
+# Each scenario drives one game's hot path with scripted input and reports
+# ticks/sec plus allocation figures. Results are compared with the stored
+# baseline (bench_baseline.json); a scenario more than --threshold slower than
+# its baseline (or whose peak memory grew by as much) fails the run.
+#
+#   python bench.py                      # run all, compare with the baseline
+#   python bench.py invader_storm        # one scenario
+#   python bench.py --update-baseline    # store this machine's numbers
+#
+# ticks/sec depends on the machine, so the comparison uses a score: ticks/sec
+# divided by the speed of a fixed pure-Python loop timed just before each run.
+#
+# pyxel has no headless mode, so the pyxel games are run against _HeadlessPyxel:
+# a stand-in module with the same input/screen API whose draw calls do nothing.
+# update() and draw() are both called each tick, so the Python side of drawing
+# (loops over the board, sprites, etc.) is still measured.
+
+import gc
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+import types
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_baseline.json")
+THRESHOLD = 0.25
+
+
+# --------------- Headless pyxel ---------------
+_KEYS = ("LEFT", "RIGHT", "UP", "DOWN", "SPACE", "RETURN", "F3", "Z", "X", "Q", "R", "P")
+
+
+def _headless_pyxel():
+    px = types.ModuleType("pyxel")
+    px.headless = True
+    for i, k in enumerate(_KEYS):
+        setattr(px, f"KEY_{k}", i + 1)
+    px.width = px.height = 0
+    px.frame_count = 0
+    px.held = set()      # 押されているキー（シナリオが毎 tick 書き換える）
+    px.pressed = set()   # この tick に押されたキー
+    px.app = None        # run() に渡された (update, draw)
+
+    def init(width, height, **kwargs):
+        px.width, px.height = width, height
+        px.frame_count = 0
+
+    def run(update, draw):
+        px.app = (update, draw)
+
+    def set_keys(keys):
+        keys = set(keys)
+        px.pressed = keys - px.held
+        px.held = keys
+
+    def frame():
+        update, draw = px.app
+        update()
+        draw()
+        px.frame_count += 1
+
+    def _nop(*args, **kwargs):
+        pass
+
+    px.init, px.run, px.set_keys, px.frame = init, run, set_keys, frame
+    px.btn = lambda key: key in px.held
+    px.btnp = lambda key, *args: key in px.pressed
+    draw_calls = ("cls", "rect", "rectb", "circ", "circb", "line", "pset", "text", "tri", "trib", "blt", "bltm")
+    px.images = [types.SimpleNamespace(**dict.fromkeys(draw_calls, _nop)) for _ in range(3)]
+    for name in draw_calls + ("camera", "clip", "pal", "play", "stop"):
+        setattr(px, name, _nop)
+    return px
+
+
+def _load_game(module):
+    # pyxel を差し替えてからゲームを import する（invader は import 時に Game() を作る）
+    px = sys.modules.get("pyxel")
+    if not getattr(px, "headless", False):
+        px = sys.modules["pyxel"] = _headless_pyxel()
+    sys.modules.pop(module, None)
+    mod = __import__(module)
+    return mod, px
+
+
+# --------------- Scenarios ---------------
+# setup() はゲームを用意して 1 tick 進める関数を返す。同じ seed なら毎回同じ入力になる
+def bomber_chain():
+    # 全マスに爆弾を敷いて 1 個から全部を誘爆させ、炎が消えるまで回す（敵は上限数）
+    from bomber_sim import (
+        BomberSim, EMPTY, BOMB_FUSE_FRAMES, EXPLOSION_FRAMES, MAX_ENEMIES, MAX_POWER_CAP,
+    )
+    sim = BomberSim(stage=2 * MAX_ENEMIES)  # 敵数が MAX_ENEMIES に届くステージ
+    spawn = sim.player.spawn
+    spots = [(x, y) for y in range(sim.gh) for x in range(sim.gw)
+             if sim.map.get(x, y) == EMPTY and (x, y) != spawn]
+    state = {"left": 0}
+
+    def tick():
+        if state["left"] == 0:
+            sim.restore(sim.start_state)
+            sim.player.inv_frames = 1 << 30
+            for i, (x, y) in enumerate(spots):
+                sim.place_bomb(x, y, 1 if i == 0 else BOMB_FUSE_FRAMES, MAX_POWER_CAP, 0)
+            state["left"] = EXPLOSION_FRAMES + 1
+        state["left"] -= 1
+        sim.tick(0)
+        sim.sounds.clear()
+        sim.dirty_tiles.clear()
+    return tick
+
+
+def invader_storm(cols=11, rows=3, spacing=(10, 8), hell=False, storm=4):
+    # 隊列がそろった状態で、毎 tick 敵弾を storm 発足し続ける。自機は左右に動きながら撃つ
+    invader, px = _load_game("invader")
+    rng = random.Random(0)
+    game = px.app[0].__self__
+    state = {"t": 0}
+
+    def restart():
+        game.__init__(cols, rows, spacing, hell)
+        game.player.lives = 1 << 30
+
+    restart()
+
+    def tick():
+        t = state["t"] = state["t"] + 1
+        if t % 1200 == 0 or not game.invaders.count or game.player.lives <= 0:
+            restart()
+        px.set_keys((px.KEY_LEFT if (t // 90) % 2 else px.KEY_RIGHT,) + ((px.KEY_SPACE,) if t % 4 else ()))
+        for _ in range(storm):
+            x, y = game.invaders.random_shooter(rng)
+            game.enemy_bullets.spawn(x + 4, y + 8, 0, 3)
+        px.frame()
+    return tick
+
+
+def invader_mega():
+    # 1,000 体（50 x 20、2 ドット間隔で重なり合う）の隊列で同じことをする
+    return invader_storm(50, 20, (2, 2))
+
+
+def invader_hell():
+    # 弾幕モード（画面に 1,000 発以上）
+    return invader_storm(hell=True, storm=0)
+
+
+def pacman_chase():
+    # 餌が全部ある盤面でゴーストに追わせる。捕まったら（食べ切ったら）盤面を戻す
+    pacman, px = _load_game("pacman")
+    rng = random.Random(0)
+    pacman.Game()
+    game = px.app[0].__self__
+    dirs = (px.KEY_UP, px.KEY_DOWN, px.KEY_LEFT, px.KEY_RIGHT)
+    state = {"key": dirs[0]}
+
+    def tick():
+        if game.game_over:
+            game.reset()
+        if rng.random() < 0.05:
+            state["key"] = rng.choice(dirs)
+        px.set_keys((state["key"],))
+        px.frame()
+    return tick
+
+
+def scroll_traversal():
+    # 右へ走りながら跳び続けてステージを抜ける。ゴールかミスで最初から
+    scroll_action, px = _load_game("scroll_action")
+    px.init(scroll_action.WIDTH, scroll_action.HEIGHT)
+    game = scroll_action.Game()
+    px.run(game.update, game.draw)
+    state = {"t": 0}
+
+    def tick():
+        if game.win or game.game_over:
+            game.reset()
+        t = state["t"] = state["t"] + 1
+        px.set_keys((px.KEY_RIGHT,) + ((px.KEY_SPACE,) if t % 40 < 20 else ()))
+        px.frame()
+    return tick
+
+
+SCENARIOS = {
+    "bomber_chain": (bomber_chain, 3000),
+    "invader_storm": (invader_storm, 3000),
+    "invader_mega": (invader_mega, 1000),
+    "invader_hell": (invader_hell, 1000),
+    "pacman_chase": (pacman_chase, 3000),
+    "scroll_traversal": (scroll_traversal, 3000),
+}
+
+
+# --------------- Measurement ---------------
+def calibrate(n=50000):
+    # 機械の速さの目安（Mloops/sec）。属性・dict・list を触る素の Python ループ
+    class P:
+        x = 0
+    p = P()
+    d = {}
+    acc = []
+    t0 = time.perf_counter()
+    for i in range(n):
+        p.x = (p.x + i) & 1023
+        d[i & 255] = p.x
+        if i & 7 == 0:
+            acc.append(d[p.x & 255] if (p.x & 255) in d else 0)
+    return n / (time.perf_counter() - t0) / 1e6
+
+
+def measure(name, ticks=None, repeat=5):
+    # score = ticks/sec ÷ 直前に測った calibrate()。周波数の揺れを打ち消すため毎回測り直し、中央値を取る
+    setup, default_ticks = SCENARIOS[name]
+    ticks = ticks or default_ticks
+    tick = setup()
+    for _ in range(ticks // 10):  # warm-up
+        tick()
+    runs = []
+    for _ in range(repeat):
+        calib = calibrate()
+        t0 = time.perf_counter()
+        for _ in range(ticks):
+            tick()
+        tps = ticks / (time.perf_counter() - t0)
+        runs.append((tps / calib, tps))
+    runs.sort()
+    score, tps = runs[len(runs) // 2]
+    # 割り当て: 確保中メモリのピーク増分（tick 内の一時確保の山）と、回した後に残ったブロック数（溜まり続けるもの）
+    gc.collect()
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    blocks = sys.getallocatedblocks()
+    for _ in range(ticks // 4):
+        tick()
+    peak = tracemalloc.get_traced_memory()[1] - base
+    tracemalloc.stop()
+    gc.collect()
+    kept = sys.getallocatedblocks() - blocks
+    return {"ticks_per_sec": tps, "score": score, "peak_kib": peak / 1024, "kept_blocks": kept}
+
+
+def compare(results, baseline, threshold):
+    # 回帰したシナリオの説明のリスト
+    bad = []
+    for name, r in results.items():
+        b = baseline.get(name)
+        if not b:
+            continue
+        if r["score"] < b["score"] * (1 - threshold):
+            bad.append(f"{name}: score {r['score']:.1f} < baseline {b['score']:.1f} - {threshold:.0%}")
+        if r["peak_kib"] > b["peak_kib"] * (1 + threshold) + 64:
+            bad.append(f"{name}: peak {r['peak_kib']:.0f} KiB > baseline {b['peak_kib']:.0f} KiB + {threshold:.0%}")
+    return bad
+
+
+if __name__ == "__main__":
+    import argparse
+    ap = argparse.ArgumentParser(description="Run the headless game benchmarks.")
+    ap.add_argument("scenarios", nargs="*", help=f"default: all of {', '.join(SCENARIOS)}")
+    ap.add_argument("--ticks", type=int, default=None, help="ticks per timed run (default per scenario)")
+    ap.add_argument("--repeat", type=int, default=5, help="timed runs per scenario (the median is kept)")
+    ap.add_argument("--threshold", type=float, default=THRESHOLD, help="allowed slowdown vs baseline")
+    ap.add_argument("--baseline", default=BASELINE)
+    ap.add_argument("--update-baseline", action="store_true")
+    args = ap.parse_args()
+    for name in args.scenarios:
+        if name not in SCENARIOS:
+            ap.error(f"unknown scenario {name!r}")
+
+    results = {}
+    for name in args.scenarios or SCENARIOS:
+        r = results[name] = measure(name, args.ticks, args.repeat)
+        print(f"{name:18} {r['ticks_per_sec']:9.0f} ticks/sec  score {r['score']:8.1f}"
+              f"  peak {r['peak_kib']:7.1f} KiB  kept {r['kept_blocks']:6d} blocks")
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    if args.update_baseline:
+        baseline.update({k: {f: round(v, 2) for f, v in r.items()} for k, r in results.items()})
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"baseline written to {args.baseline}")
+    else:
+        bad = compare(results, baseline, args.threshold)
+        for line in bad:
+            print("REGRESSION", line)
+        sys.exit(1 if bad else 0)
@@ -0,0 +1,362 @@
+# Bomber-Pyxel bot player and incremental danger map
+#
+# DangerMap keeps, for every tile, the frame at which a pending bomb's blast will
+# reach it (0 = no bomb reaches it). It is updated from BomberSim's hooks:
+#   - a bomb is placed      -> add its blast rays, and pull forward any bomb it would chain
+#   - bombs detonate        -> drop their rays; a ray that was stopped by a soft block
+#                              that just broke is extended
+#   - reset() / restore()   -> rebuilt from scratch (restart, rollback)
+# The rays come from BomberSim.blast_tiles, the same code _explode uses.
+#
+# Bot turns the danger map into an input bitmask once per frame. At each tile centre
+# it searches a few tiles around it (breadth first, each step = STEP_FRAMES frames):
+#   1. in a pending blast     -> walk to the nearest tile no blast reaches
+#   2. a bomb here is useful  -> drop it if a safe tile is reachable before it blows
+#   3. otherwise              -> walk toward a powerup, soft block or opponent
+# Tiles next to an enemy are never entered, since enemies kill on touch.
+#
+#   sim = BomberSim(players=2)
+#   bots = [Bot(sim, 1)]
+#   sim.tick([my_input, bots[0].input()])
+#
+# Headless soak / benchmark (4 bots, 100 enemies):
+#
+#   python bomber_bot.py --bots 4 --enemies 100 --size 31x31 --ticks 36000
+
+import random
+from array import array
+from collections import deque
+
+from bomber_sim import (
+    TILE, HUD_H, PLAYER_STEP_SPEED, EXPLOSION_FRAMES, BOMB_FUSE_FRAMES,
+    WALL, SOFT, PWR_FIRE, PWR_BOMB, PLAYING, IN_BOMB, DIR_BITS,
+    BomberSim, to_tile,
+)
+
+# Frames to walk one tile
+STEP_FRAMES = int(TILE / PLAYER_STEP_SPEED)
+# Tiles visited per search (keeps a bot's decision O(1) on large arenas)
+MAX_SEARCH = 160
+
+
+class DangerMap:
+    # sim.danger に自分を登録し、以後 sim から add / remove / rebuild が呼ばれる
+    def __init__(self, sim):
+        self.sim = sim
+        sim.danger = self
+        self.rebuild()
+
+    @classmethod
+    def attach(cls, sim):
+        # 既に付いていればそれを使う（ボットが何体でも危険マップは1枚）
+        return sim.danger if sim.danger is not None else cls(sim)
+
+    def rebuild(self):
+        sim = self.sim
+        self.w = sim.gw
+        # タイル index -> 炎が届く最初のフレーム（0 = 届かない）
+        self.until = array("i", bytes(4 * sim.gw * sim.gh))
+        self.rays = {}   # 爆弾のタイル index -> 射線のタイル index のリスト
+        self.due = {}    # 爆弾のタイル index -> 起爆フレーム（誘爆込み）
+        self.cover = {}  # タイル index -> そこに届く爆弾のタイル index の集合
+        self.stops = {}  # ソフトブロックのタイル index -> そこで射線が止まっている爆弾
+        self.power = {}
+        self._enemy_frame = -1
+        # restore 直後は導火線が既にこのフレームの分だけ減っている
+        for b in sorted(sim.bombs, key=lambda b: b.seq):
+            self.add(b, sim.frame + b.fuse)
+
+    # --------------- Hooks ---------------
+    def add(self, bomb, due):
+        bi = bomb.ty * self.w + bomb.tx
+        self.power[bi] = bomb.power
+        # 既に他の爆風の中に置かれたなら、その爆弾と一緒に起爆する
+        d = self.until[bi]
+        self.due[bi] = due if not d or d > due else d
+        self.rays[bi] = []
+        self._extend(bi)
+
+    def remove(self, bombs):
+        w = self.w
+        cells = self.sim.map.cells
+        touched = set()
+        for b in bombs:
+            bi = b.ty * w + b.tx
+            for t in self.rays.pop(bi, ()):
+                self.cover[t].discard(bi)
+                touched.add(t)
+            del self.due[bi], self.power[bi]
+        # 壊れたソフトブロックで止まっていた射線を伸ばす
+        for t in touched:
+            stopped = self.stops.get(t)
+            if stopped and cells[t] != SOFT:
+                del self.stops[t]
+                for bi in stopped:
+                    if bi in self.rays:
+                        self._extend(bi)
+        until, cover, due = self.until, self.cover, self.due
+        for t in touched:
+            bs = cover[t]
+            until[t] = min(due[bi] for bi in bs) if bs else 0
+
+    # --------------- Internals ---------------
+    def _extend(self, bi):
+        # 射線を今のマップで引き直し、新しく届くようになったタイルを足す（射線は伸びるだけ）
+        w = self.w
+        ray = self.rays[bi]
+        have = set(ray)
+        new = []
+        cells = self.sim.map.cells
+        for tx, ty in self.sim.blast_tiles(bi % w, bi // w, self.power[bi]):
+            t = ty * w + tx
+            if t in have:
+                continue
+            ray.append(t)
+            new.append(t)
+            self.cover.setdefault(t, set()).add(bi)
+            if cells[t] == SOFT:
+                self.stops.setdefault(t, set()).add(bi)
+        self._spread(bi, new)
+
+    def _spread(self, bi, tiles):
+        # bi の起爆フレームを tiles に書き、届いた爆弾の起爆が早まるならそちらも伝える
+        until, due, rays = self.until, self.due, self.rays
+        work = [(bi, tiles)]
+        while work:
+            src, ts = work.pop()
+            d = due[src]
+            for t in ts:
+                if not until[t] or until[t] > d:
+                    until[t] = d
+                if t != src and t in rays and due[t] > d:
+                    due[t] = d
+                    work.append((t, rays[t]))
+
+    # --------------- Queries ---------------
+    def enemy_tiles(self):
+        # (敵のいるタイル, 敵のいるタイルとその隣)。フレームごとに1回だけ数えてボット間で共有
+        sim = self.sim
+        if self._enemy_frame == sim.frame:
+            return self._enemies, self._avoid
+        w = sim.gw
+        if sim.vector_enemies:
+            es = sim.enemies
+            live = es.alive
+            tx = (es.x[live] // TILE).astype(int)
+            ty = ((es.y[live] - HUD_H) // TILE).astype(int)
+            enemies = set((ty * w + tx).tolist())
+        else:
+            enemies = {int((e.y - HUD_H) // TILE) * w + int(e.x // TILE) for e in sim.enemies if e.alive}
+        avoid = set(enemies)
+        for t in enemies:
+            avoid.update((t - 1, t + 1, t - w, t + w))
+        self._enemies, self._avoid, self._enemy_frame = enemies, avoid, sim.frame
+        return enemies, avoid
+
+    def unsafe(self, t, t0, t1):
+        # タイル t に t0..t1 フレームの間いると焼かれるか（今ある炎も見る）
+        d = self.until[t]
+        if d and d <= t1 + 1 and t0 <= d + EXPLOSION_FRAMES:
+            return True
+        return self.sim.flame_until[t] >= t0
+
+
+# (dx, dy, input bit) in the sim's key priority order
+_STEPS = tuple((dx, dy, bit) for (dx, dy), bit in DIR_BITS)
+
+
+class Bot:
+    # sim.players[idx] を操作する。input() を sim.tick の直前に毎フレーム呼ぶ
+    def __init__(self, sim, idx=0, seed=0):
+        self.sim = sim
+        self.idx = idx
+        self.danger = DangerMap.attach(sim)
+        self.rng = random.Random(seed)  # 同点の行き先選び用（ネット対戦では入力ごと送るので同期不要）
+        self.rivals = set()  # 他のプレイヤーのいるタイル
+        self.enemies = set()  # 敵のいるタイル
+        self.avoid = set()   # 敵のいるタイルとその隣（入らない）
+
+    def input(self):
+        sim = self.sim
+        p = sim.players[self.idx]
+        if not p.alive or p.moving:
+            return 0  # タイル中心に着いてから次を決める
+        tx, ty = to_tile(p.x, p.y)
+        here = ty * sim.gw + tx
+        now = sim.frame + 1
+        self._scan_foes()
+
+        if not self._is_safe(here, now, {}):
+            # 敵の隣を避けて逃げ道が無ければ、敵の隣も通る（炎は確実に死ぬ）
+            return (self._step(here, now, self._is_safe, {})
+                    or self._step(here, now, self._is_safe, {}, avoid=()))
+
+        if self._bomb_is_useful(p, tx, ty):
+            move = self._step(here, now, self._is_safe, self._would_blast(p, tx, ty, now))
+            if move:
+                return IN_BOMB | move
+
+        move = self._step(here, now, self._target_goal(), {})
+        if move:
+            return move
+        return self._wander(here, now)
+
+    # --------------- Search ---------------
+    def _step(self, start, now, goal, extra, avoid=None):
+        # start から goal を満たす最寄りのタイルへの最初の一歩（入力ビット）。無ければ 0
+        sim = self.sim
+        w = sim.gw
+        cells = sim.map.cells
+        bombs = sim.bomb_index
+        danger = self.danger
+        if avoid is None:
+            avoid = self.avoid
+        if goal(start, now, extra):
+            return 0
+        seen = {start: 0}
+        q = deque([(start, now, 0)])
+        n = 0
+        while q and n < MAX_SEARCH:
+            t, at, first = q.popleft()
+            n += 1
+            nxt = at + STEP_FRAMES
+            for dx, dy, bit in _STEPS:
+                u = t + dy * w + dx
+                if u in seen or u in avoid or cells[u] == WALL or cells[u] == SOFT:
+                    continue
+                if (u % w, u // w) in bombs:
+                    continue
+                if danger.unsafe(u, at, nxt) or self._extra_unsafe(extra, u, at, nxt):
+                    continue
+                step = first or bit
+                if goal(u, nxt, extra):
+                    return step
+                seen[u] = step
+                q.append((u, nxt, step))
+        return 0
+
+    def _is_safe(self, t, at, extra):
+        # ここで待っていれば焼かれない（どの爆風も届かず、今の炎も消えている）
+        return (not self.danger.until[t] and t not in extra
+                and self.sim.flame_until[t] < at)
+
+    @staticmethod
+    def _extra_unsafe(extra, t, t0, t1):
+        d = extra.get(t)
+        return d is not None and d <= t1 + 1 and t0 <= d + EXPLOSION_FRAMES
+
+    # --------------- Bombing ---------------
+    def _bomb_is_useful(self, p, tx, ty):
+        sim = self.sim
+        if (tx, ty) in sim.bomb_index:
+            return False
+        placed = 0
+        for b in sim.bombs:
+            if b.owner == p.idx:
+                placed += 1
+        if placed >= p.bombs:
+            return False
+        cells = sim.map.cells
+        w = sim.gw
+        for x, y in sim.blast_tiles(tx, ty, p.power):
+            t = y * w + x
+            if cells[t] == SOFT or t in self.rivals or t in self.enemies:
+                return True
+        return False
+
+    def _would_blast(self, p, tx, ty, now):
+        # ここに置いた場合に新しく焼かれるタイル -> 起爆フレーム
+        sim = self.sim
+        w = sim.gw
+        danger = self.danger
+        here = ty * w + tx
+        d = danger.until[here]
+        due = now + BOMB_FUSE_FRAMES - 1
+        if d and d < due:
+            due = d
+        extra = {}
+        for x, y in sim.blast_tiles(tx, ty, p.power):
+            t = y * w + x
+            extra[t] = due
+            # 巻き込む爆弾は一緒に起爆する（1段だけ見る）
+            if t != here and t in danger.rays and danger.due[t] > due:
+                for u in danger.rays[t]:
+                    if u not in extra or extra[u] > due:
+                        extra[u] = due
+        return extra
+
+    def _scan_foes(self):
+        # 他のプレイヤーと敵のいるタイル index を集める（判断1回につき1度）
+        sim = self.sim
+        w = sim.gw
+        rivals = set()
+        for q in sim.players:
+            if q.alive and q.idx != self.idx:
+                x, y = to_tile(q.x, q.y)
+                rivals.add(y * w + x)
+        self.rivals = rivals
+        self.enemies, self.avoid = self.danger.enemy_tiles()
+
+    def _target_goal(self):
+        # 行き先: パワーアップ、ソフトブロックの隣、他のプレイヤー（探索中にその場で判定）
+        cells = self.sim.map.cells
+        w = self.sim.gw
+        rivals = self.rivals
+
+        def goal(t, at, extra):
+            c = cells[t]
+            return (c == PWR_BOMB or c == PWR_FIRE or t in rivals
+                    or cells[t - 1] == SOFT or cells[t + 1] == SOFT
+                    or cells[t - w] == SOFT or cells[t + w] == SOFT)
+        return goal
+
+    def _wander(self, here, now):
+        # 行き先が無い（届かない）ときは安全な隣へランダムに
+        sim = self.sim
+        w = sim.gw
+        cells = sim.map.cells
+        opts = []
+        for dx, dy, bit in _STEPS:
+            u = here + dy * w + dx
+            if cells[u] == WALL or cells[u] == SOFT or u in self.avoid or (u % w, u // w) in sim.bomb_index:
+                continue
+            if not self.danger.unsafe(u, now, now + 2 * STEP_FRAMES):
+                opts.append(bit)
+        return self.rng.choice(opts) if opts else 0
+
+
+# --------------- Headless soak / benchmark ---------------
+def soak(bots=4, enemies=100, size=(31, 31), ticks=36000, stage=1, vector=False):
+    # ボットだけで回し、(ticks/sec, 終了した試合数) を返す
+    import time
+    sim = BomberSim(stage, n_enemies=enemies, size=size, players=bots, vector_enemies=vector)
+    ais = [Bot(sim, i, seed=i) for i in range(bots)]
+    inputs = [0] * bots
+    rounds = 0
+    t0 = time.perf_counter()
+    for _ in range(ticks):
+        for i, ai in enumerate(ais):
+            inputs[i] = ai.input()
+        status = sim.tick(inputs if bots > 1 else inputs[0])
+        sim.sounds.clear()
+        sim.dirty_tiles.clear()
+        if status != PLAYING:
+            rounds += 1
+            sim.reset()
+    dt = time.perf_counter() - t0
+    return (ticks / dt if dt > 0 else float("inf")), rounds
+
+
+if __name__ == "__main__":
+    import argparse
+    ap = argparse.ArgumentParser(description="Run Bomber bots headless.")
+    ap.add_argument("--bots", type=int, default=4)
+    ap.add_argument("--enemies", type=int, default=100)
+    ap.add_argument("--size", default="31x31")
+    ap.add_argument("--ticks", type=int, default=36000)
+    ap.add_argument("--stage", type=int, default=1)
+    ap.add_argument("--vector", action="store_true", help="use the NumPy enemy store")
+    args = ap.parse_args()
+    w, h = (int(v) for v in args.size.lower().split("x"))
+    rate, rounds = soak(args.bots, args.enemies, (w, h), args.ticks, args.stage, args.vector)
+    print(f"{rate:.0f} ticks/sec ({rate / 60:.1f}x real time), {rounds} rounds finished")
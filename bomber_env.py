@@ -0,0 +1,277 @@
+# Bomber-Pyxel reinforcement-learning environment (Gym-style, needs numpy)
+#
+# BomberEnv wraps one BomberSim with the Gymnasium reset/step API (no gym
+# dependency). VecBomberEnv runs N of them across worker processes; actions,
+# observations, rewards and done flags live in one shared-memory block, so a
+# step only sends a one-word command down each worker's pipe.
+#
+#   env = BomberEnv(stage=1)
+#   obs, info = env.reset(seed=0)
+#   obs, reward, terminated, truncated, info = env.step(ACT_BOMB)
+#
+#   venv = VecBomberEnv(64, workers=8)
+#   obs = venv.reset(seed=0)                       # (64, N_PLANES, h, w) uint8
+#   obs, rew, term, trunc = venv.step(actions)     # finished envs reset themselves
+#
+# Throughput (steps/sec for a given env and worker count):
+#
+#   python bomber_env.py --envs 64 --workers 8 --steps 2000
+
+import random
+from multiprocessing import get_context
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+from bomber_sim import (
+    TILE, HUD_H, GRID_W, GRID_H, BOMB_FUSE_FRAMES,
+    WALL, SOFT, PWR_FIRE, PWR_BOMB,
+    PLAYING, CLEAR,
+    IN_RIGHT, IN_LEFT, IN_DOWN, IN_UP, IN_BOMB,
+    BomberSim,
+)
+
+# Actions (Discrete(6))
+ACT_NOOP, ACT_RIGHT, ACT_LEFT, ACT_DOWN, ACT_UP, ACT_BOMB = range(6)
+N_ACTIONS = 6
+_ACTION_INPUT = (0, IN_RIGHT, IN_LEFT, IN_DOWN, IN_UP, IN_BOMB)
+
+# Observation planes (uint8, channels first, one cell per tile)
+PL_WALL, PL_SOFT, PL_PWR_FIRE, PL_PWR_BOMB, PL_BOMB, PL_FLAME, PL_ENEMY, PL_SELF, PL_RIVAL = range(9)
+N_PLANES = 9
+# PL_BOMB holds the remaining fuse scaled to 1..255 (0 = no bomb); the others are 0/255
+
+# Rewards
+R_KILL = 1.0
+R_HURT = -1.0
+R_CLEAR = 10.0
+R_STEP = -0.001
+
+
+class BomberEnv:
+    # stages: reset() でこの中から選ぶ。frame_skip: 1 step で進める tick 数（行動は保持）
+    # obs: 観測を書き込む (N_PLANES, h, w) uint8 配列（VecBomberEnv が共有メモリを渡す）
+    def __init__(self, stage=1, stages=None, size=(GRID_W, GRID_H), n_enemies=None,
+                 max_steps=3000, frame_skip=1, obs=None):
+        self.stages = tuple(stages) if stages else (stage,)
+        self.size = size
+        self.max_steps = max_steps
+        self.frame_skip = frame_skip
+        w, h = size
+        self.obs = np.zeros((N_PLANES, h, w), dtype=np.uint8) if obs is None else obs
+        self.rng = random.Random()
+        self.sim = BomberSim(self.stages[0], n_enemies=n_enemies, size=size)
+        self.steps = 0
+
+    @property
+    def observation_shape(self):
+        return self.obs.shape
+
+    def reset(self, seed=None, options=None):
+        if seed is not None:
+            self.rng.seed(seed)
+        sim = self.sim
+        stage = self.rng.choice(self.stages)
+        if stage == sim.stage:
+            sim.restore(sim.start_state)  # 同じステージは生成し直さない
+        else:
+            sim.stage = stage
+            sim.reset()
+        # 配置はステージ固定のまま、敵の動きとドロップは env の乱数から引き直す（seed ごとに別の展開）
+        sim.rng_ai.seed(self.rng.getrandbits(64))
+        sim.rng_loot.seed(self.rng.getrandbits(64))
+        sim.sounds.clear()
+        sim.dirty_tiles.clear()
+        self.steps = 0
+        self._render()
+        return self.obs, {"stage": stage}
+
+    def step(self, action):
+        sim = self.sim
+        inp = _ACTION_INPUT[action]
+        left, lives = sim.enemies_left, sim.player.lives
+        status = PLAYING
+        for _ in range(self.frame_skip):
+            status = sim.tick(inp)
+            if status != PLAYING:
+                break
+        sim.sounds.clear()
+        sim.dirty_tiles.clear()
+        self.steps += 1
+        reward = (R_STEP + R_KILL * (left - sim.enemies_left)
+                  + R_HURT * (lives - sim.player.lives)
+                  + (R_CLEAR if status == CLEAR else 0.0))
+        terminated = status != PLAYING
+        truncated = not terminated and self.steps >= self.max_steps
+        self._render()
+        return self.obs, reward, terminated, truncated, {}
+
+    def _render(self):
+        # sim の状態を観測プレーンに書く（obs を使い回すので確保はしない）
+        sim = self.sim
+        obs = self.obs
+        w = sim.gw
+        cells = np.frombuffer(sim.map.cells, dtype=np.uint8).reshape(sim.gh, w)
+        np.multiply(cells == WALL, 255, out=obs[PL_WALL], casting="unsafe")
+        np.multiply(cells == SOFT, 255, out=obs[PL_SOFT], casting="unsafe")
+        np.multiply(cells == PWR_FIRE, 255, out=obs[PL_PWR_FIRE], casting="unsafe")
+        np.multiply(cells == PWR_BOMB, 255, out=obs[PL_PWR_BOMB], casting="unsafe")
+        flame = np.frombuffer(sim.flame_until, dtype=np.int32).reshape(sim.gh, w)
+        np.multiply(flame > sim.flame_now, 255, out=obs[PL_FLAME], casting="unsafe")
+        obs[PL_BOMB].fill(0)
+        obs[PL_ENEMY:].fill(0)
+        bomb = obs[PL_BOMB]
+        for b in sim.bombs:
+            bomb[b.ty, b.tx] = 1 + 254 * b.fuse // BOMB_FUSE_FRAMES
+        enemy = obs[PL_ENEMY]
+        if sim.vector_enemies:
+            es = sim.enemies
+            live = es.alive
+            enemy[((es.y[live] - HUD_H) // TILE).astype(int), (es.x[live] // TILE).astype(int)] = 255
+        else:
+            for e in sim.enemies:
+                if e.alive:
+                    enemy[int((e.y - HUD_H) // TILE), int(e.x // TILE)] = 255
+        for p in sim.players:
+            if p.alive:
+                obs[PL_SELF if p.idx == 0 else PL_RIVAL, int((p.y - HUD_H) // TILE), int(p.x // TILE)] = 255
+
+
+# --------------- Vectorised (process pool + shared memory) ---------------
+def _layout(n, obs_shape):
+    # 共有メモリ内の配列 (name, dtype, shape, offset)。各配列は 8 バイト境界に置く
+    arrays = (("obs", np.uint8, (n,) + tuple(obs_shape)), ("actions", np.int64, (n,)),
+              ("rewards", np.float32, (n,)), ("terminated", np.bool_, (n,)), ("truncated", np.bool_, (n,)))
+    out = []
+    off = 0
+    for name, dtype, shape in arrays:
+        out.append((name, dtype, shape, off))
+        off += -(-int(np.prod(shape)) * np.dtype(dtype).itemsize // 8) * 8
+    return out, off
+
+
+def _views(buf, layout):
+    return {name: np.ndarray(shape, dtype=dtype, buffer=buf, offset=off) for name, dtype, shape, off in layout}
+
+
+def _worker(conn, shm_name, layout, lo, hi, kwargs):
+    # envs[lo:hi] を受け持つ。コマンドは ("reset", seed) / ("step", None) / ("close", None)
+    shm = SharedMemory(name=shm_name)
+    try:
+        v = _views(shm.buf, layout)
+        obs, actions, rewards = v["obs"], v["actions"], v["rewards"]
+        terminated, truncated = v["terminated"], v["truncated"]
+        envs = [BomberEnv(obs=obs[i], **kwargs) for i in range(lo, hi)]
+        while True:
+            cmd, arg = conn.recv()
+            if cmd == "step":
+                for i, env in enumerate(envs, lo):
+                    _, r, te, tr, _ = env.step(actions[i])
+                    rewards[i], terminated[i], truncated[i] = r, te, tr
+                    if te or tr:
+                        env.reset()  # 自動リセット（返す観測は次のエピソードの最初）
+                conn.send(None)
+            elif cmd == "reset":
+                for i, env in enumerate(envs, lo):
+                    env.reset(seed=None if arg is None else arg + i)
+                conn.send(None)
+            else:
+                break
+        del obs, actions, rewards, terminated, truncated, v, envs
+    finally:
+        shm.close()
+        conn.close()
+
+
+class VecBomberEnv:
+    # n 個の BomberEnv を workers プロセスに均等に割り振る。kwargs は BomberEnv へ
+    def __init__(self, n, workers=None, context=None, **kwargs):
+        import os
+        workers = min(n, workers or os.cpu_count() or 1)
+        self.n = n
+        w, h = kwargs.get("size", (GRID_W, GRID_H))
+        layout, nbytes = _layout(n, (N_PLANES, h, w))
+        self._shm = SharedMemory(create=True, size=nbytes)
+        v = _views(self._shm.buf, layout)
+        self.obs, self.actions, self.rewards = v["obs"], v["actions"], v["rewards"]
+        self.terminated, self.truncated = v["terminated"], v["truncated"]
+        ctx = get_context(context)
+        self._conns = []
+        self._procs = []
+        for k in range(workers):
+            lo, hi = n * k // workers, n * (k + 1) // workers
+            parent, child = ctx.Pipe()
+            proc = ctx.Process(target=_worker, args=(child, self._shm.name, layout, lo, hi, kwargs), daemon=True)
+            proc.start()
+            child.close()
+            self._conns.append(parent)
+            self._procs.append(proc)
+
+    def _call(self, cmd, arg=None):
+        for c in self._conns:
+            c.send((cmd, arg))
+        for c in self._conns:
+            c.recv()
+
+    def reset(self, seed=None):
+        self._call("reset", seed)
+        return self.obs
+
+    def step(self, actions):
+        # 戻り値の配列は共有メモリのビュー（次の step で上書きされる）
+        self.actions[:] = actions
+        self._call("step")
+        return self.obs, self.rewards, self.terminated, self.truncated
+
+    def close(self):
+        if self._shm is None:
+            return
+        for c in self._conns:
+            try:
+                c.send(("close", None))
+            except OSError:
+                pass
+        for p in self._procs:
+            p.join(timeout=5)
+        del self.obs, self.actions, self.rewards, self.terminated, self.truncated
+        self._shm.close()
+        self._shm.unlink()
+        self._shm = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+    ap = argparse.ArgumentParser(description="Measure Bomber env steps/sec with random actions.")
+    ap.add_argument("--envs", type=int, default=64)
+    ap.add_argument("--workers", type=int, default=None, help="0 = a single env in this process")
+    ap.add_argument("--steps", type=int, default=2000, help="vector steps (x envs env steps)")
+    ap.add_argument("--frame-skip", type=int, default=1)
+    args = ap.parse_args()
+
+    rng = np.random.default_rng(0)
+    if args.workers == 0:
+        env = BomberEnv(frame_skip=args.frame_skip)
+        env.reset(seed=0)
+        acts = rng.integers(0, N_ACTIONS, args.steps).tolist()
+        t0 = time.perf_counter()
+        for a in acts:
+            _, _, te, tr, _ = env.step(a)
+            if te or tr:
+                env.reset()
+        total = args.steps
+    else:
+        with VecBomberEnv(args.envs, args.workers, frame_skip=args.frame_skip) as venv:
+            venv.reset(seed=0)
+            t0 = time.perf_counter()
+            for _ in range(args.steps):
+                venv.step(rng.integers(0, N_ACTIONS, args.envs))
+            total = args.steps * args.envs
+    dt = time.perf_counter() - t0
+    print(f"{total / dt:.0f} env steps/sec")
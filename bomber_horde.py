@@ -0,0 +1,141 @@
+# Bomber-Pyxel: struct-of-arrays enemy store (NumPy) for "horde" stages
+#
+# BomberSim(..., vector_enemies=True) keeps its enemies here instead of a list of
+# Enemy dataclasses. The update does the same thing as BomberSim._update_enemies
+# (flame kill, centre snap, direction choice, axis-separated collision, touch
+# damage), but as array operations against a blocking mask built once per tick.
+#
+# Direction choice draws from sim.rng_ai in the same order as the list version
+# (enemy by enemy, random() then choice()), so a stage plays out identically.
+# Only the draws themselves stay in Python; the choice sets are computed in batch.
+
+import numpy as np
+
+from bomber_sim import (
+    TILE, HUD_H, WALL, SOFT, ENEMY_SPEED, CHUNK, ACTIVE_CHUNKS,
+    Enemy,
+)
+
+# Same order as the list version: R, L, D, U
+_DIRS = ((1, 0), (-1, 0), (0, 1), (0, -1))
+_DX = np.array([d[0] for d in _DIRS], dtype=np.int64)
+_DY = np.array([d[1] for d in _DIRS], dtype=np.int64)
+
+
+def _blocked_at(blocked, gw, gh, tx, ty):
+    # 範囲外は壁扱い（_is_blocking_tile と同じ）
+    oob = (tx < 0) | (tx >= gw) | (ty < 0) | (ty >= gh)
+    i = np.clip(ty, 0, gh - 1) * gw + np.clip(tx, 0, gw - 1)
+    return oob | blocked[i]
+
+
+def _rect_vs_blocking(blocked, gw, gh, x0, y0, x1, y1):
+    # BomberSim._rect_vs_blocking の一括版。敵の矩形(12px)はタイル(16px)より小さいので
+    # 調べるタイルは最大 2x2。
+    tx0 = np.floor_divide(x0, TILE).astype(np.int64)
+    ty0 = np.floor_divide(y0 - HUD_H, TILE).astype(np.int64)
+    tx1 = np.floor_divide(x1, TILE).astype(np.int64)
+    ty1 = np.floor_divide(y1 - HUD_H, TILE).astype(np.int64)
+    hit = np.zeros(len(x0), dtype=bool)
+    for tx in (tx0, tx1):
+        bx0 = tx * TILE
+        ox = ~((x1 <= bx0) | (x0 >= bx0 + TILE))
+        for ty in (ty0, ty1):
+            by0 = ty * TILE + HUD_H
+            oy = ~((y1 <= by0) | (y0 >= by0 + TILE))
+            hit |= ox & oy & _blocked_at(blocked, gw, gh, tx, ty)
+    return hit
+
+
+class EnemyArrays:
+    __slots__ = ("x", "y", "dirx", "diry", "alive")
+
+    def __init__(self, enemies):
+        self.x = np.array([e.x for e in enemies], dtype=np.float64)
+        self.y = np.array([e.y for e in enemies], dtype=np.float64)
+        self.dirx = np.array([e.dirx for e in enemies], dtype=np.int64)
+        self.diry = np.array([e.diry for e in enemies], dtype=np.int64)
+        self.alive = np.array([e.alive for e in enemies], dtype=bool)
+
+    def __len__(self):
+        return len(self.x)
+
+    def __iter__(self):
+        # 描画・デバッグ用（Enemy のコピーを返す）
+        cols = (self.x.tolist(), self.y.tolist(), self.dirx.tolist(), self.diry.tolist(), self.alive.tolist())
+        for x, y, dx, dy, alive in zip(*cols):
+            yield Enemy(x, y, dx, dy, alive)
+
+    def any_alive(self):
+        return bool(self.alive.any())
+
+    def update(self, sim):
+        gw, gh = sim.map.w, sim.map.h
+        cells = np.frombuffer(sim.map.cells, dtype=np.uint8)
+        blocked = (cells == WALL) | (cells == SOFT)
+        if sim.bomb_index:
+            blocked[[ty * gw + tx for tx, ty in sim.bomb_index]] = True
+
+        # 生きているプレイヤー周辺チャンクの敵だけ動かす（BomberSim._active_enemy_ids と同じ範囲）
+        ecx = np.floor_divide(self.x, TILE).astype(np.int64) // CHUNK
+        ecy = np.floor_divide(self.y - HUD_H, TILE).astype(np.int64) // CHUNK
+        near = np.zeros(len(self.x), dtype=bool)
+        for pcx, pcy in sim.player_chunks():
+            near |= (np.abs(ecx - pcx) <= ACTIVE_CHUNKS) & (np.abs(ecy - pcy) <= ACTIVE_CHUNKS)
+        live = np.flatnonzero(self.alive & near)
+        if len(live):
+            self._move(sim, live, blocked, gw, gh)
+
+        # Touch damage（最初の1体で無敵時間に入るので、以降の敵は当たらない）
+        for p in sim.players:
+            if p.inv_frames == 0 and p.alive:
+                px0, py0, px1, py1 = p.rect()
+                x, y = self.x, self.y
+                touch = self.alive & ~((px1 < x - 6) | (px0 > x + 6) | (py1 < y - 6) | (py0 > y + 6))
+                if touch.any():
+                    sim._hurt_player(p)
+
+    def _move(self, sim, live, blocked, gw, gh):
+        x, y = self.x[live], self.y[live]
+        tx = np.floor_divide(x, TILE).astype(np.int64)
+        ty = np.floor_divide(y - HUD_H, TILE).astype(np.int64)
+
+        # 炎に触れた敵は倒れる（移動しない）
+        flame = np.asarray(sim.flame_until)[ty * gw + tx] > sim.flame_now
+        if flame.any():
+            self.alive[live[flame]] = False
+            keep = ~flame
+            live, x, y, tx, ty = live[keep], x[keep], y[keep], tx[keep], ty[keep]
+        dirx, diry = self.dirx[live], self.diry[live]
+
+        # タイル中心でスナップして進路を選ぶ
+        rng = sim.rng_ai
+        cx = tx * TILE + TILE // 2
+        cy = ty * TILE + HUD_H + TILE // 2
+        at_center = (np.abs(x - cx) < 1) & (np.abs(y - cy) < 1)
+        if at_center.any():
+            x = np.where(at_center, cx, x)
+            y = np.where(at_center, cy, y)
+            c = np.flatnonzero(at_center)
+            ntx = tx[c, None] + _DX
+            nty = ty[c, None] + _DY
+            open_ = ~_blocked_at(blocked, gw, gh, ntx, nty)
+            for j, row in zip(c.tolist(), open_.tolist()):
+                choices = [d for d, ok in zip(_DIRS, row) if ok]
+                if (dirx[j], diry[j]) in choices and rng.random() < 0.7:
+                    pass
+                else:
+                    if choices:
+                        dirx[j], diry[j] = rng.choice(choices)
+
+        # 軸ごとの移動（方向0の軸は位置が変わらない）
+        spd = ENEMY_SPEED
+        nx = x + dirx * spd
+        ok = (dirx != 0) & ~_rect_vs_blocking(blocked, gw, gh, nx - 6, y - 6, nx + 6, y + 6)
+        x = np.where(ok, nx, x)
+        ny = y + diry * spd
+        ok = (diry != 0) & ~_rect_vs_blocking(blocked, gw, gh, x - 6, ny - 6, x + 6, ny + 6)
+        y = np.where(ok, ny, y)
+
+        self.x[live], self.y[live] = x, y
+        self.dirx[live], self.diry[live] = dirx, diry
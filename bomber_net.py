@@ -0,0 +1,378 @@
+# Bomber-Pyxel versus mode: rollback netcode over UDP
+#
+# Every peer runs the same deterministic BomberSim(players=N) and only input
+# bitmasks cross the network. Remote inputs that have not arrived yet are
+# predicted (the last known held directions, no bomb); when the real input turns
+# out different, the sim is restored to the snapshot before that frame and the
+# frames up to the present are re-simulated within the same update.
+#
+# Two processes on localhost (headless, random inputs):
+#
+#   python bomber_net.py --player 0 --port 7700 --peer 127.0.0.1:7701
+#   python bomber_net.py --player 1 --port 7701 --peer 127.0.0.1:7700
+#
+# Add --delay-ms 60 --jitter-ms 20 --loss 0.1 to either side to simulate a bad link.
+# The playable version is `python Bomber.py --net 0 --port 7700 --peer 127.0.0.1:7701`.
+#
+# Packet layout (little endian):
+#   header : magic "BMNT", player u8, count u8, ack u32, start u32, check frame u32, check crc u32
+#   inputs : count x u16, the sender's inputs for frames start .. start + count - 1
+# Each packet repeats every input the receiver has not acknowledged yet, so a lost
+# packet is covered by the next one and no retransmission timer is needed.
+
+import heapq
+import random
+import socket
+import struct
+import time
+import zlib
+from array import array
+
+from bomber_sim import (
+    FPS, PLAYING, IN_PRESSED_SHIFT, IN_BOMB, IN_RESTART, MAX_PLAYERS,
+    BomberSim,
+)
+
+MAGIC = b"BMNT"
+PACKET = struct.Struct("<4sBBIIII")
+INPUT = struct.Struct("<H")
+
+# Local input delay (frames). Inputs are scheduled this far ahead so a peer with
+# less than delay/60 s of latency never needs to roll back
+INPUT_DELAY = 2
+# Deepest rollback. A peer whose inputs lag further than this stalls the sim
+MAX_ROLLBACK = 8
+# Inputs per player kept in the ring (must exceed the in-flight window)
+RING = 128
+MAX_SEND = 64
+# A confirmed state checksum is exchanged every CHECK_EVERY frames
+CHECK_EVERY = FPS
+
+# Prediction keeps the held directions only; edges and bombs are never repeated
+HELD_MASK = (1 << IN_PRESSED_SHIFT) - 1
+
+
+class UdpTransport:
+    # 非ブロッキング UDP。peers は player 番号 -> (host, port)
+    def __init__(self, port, peers, host="127.0.0.1"):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind((host, port))
+        self.sock.setblocking(False)
+        self.peers = peers
+
+    def send(self, player, data):
+        try:
+            self.sock.sendto(data, self.peers[player])
+        except OSError:
+            pass  # 相手がまだ起動していない（ICMP unreachable）など。次のパケットで再送される
+
+    def recv(self):
+        # 届いているデータグラムを全部返す
+        out = []
+        while True:
+            try:
+                data, _ = self.sock.recvfrom(2048)
+            except (BlockingIOError, InterruptedError):
+                return out
+            except OSError:
+                continue  # Windows は相手ポートが閉じていると recvfrom が ConnectionResetError になる
+            out.append(data)
+
+    def close(self):
+        self.sock.close()
+
+
+class LossyTransport:
+    # 遅延・ゆらぎ・パケットロスを足すシム（送信側に挟む）。seed を固定すれば毎回同じ落ち方になる
+    def __init__(self, inner, delay_ms=0, jitter_ms=0, loss=0.0, seed=0, clock=time.monotonic):
+        self.inner = inner
+        self.delay = delay_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self.loss = loss
+        self.rng = random.Random(seed)
+        self.clock = clock
+        self._queue = []  # (送出時刻, 連番, player, data)
+        self._seq = 0
+
+    def send(self, player, data):
+        if self.rng.random() < self.loss:
+            return
+        at = self.clock() + self.delay + self.rng.uniform(0, self.jitter)
+        self._seq += 1
+        heapq.heappush(self._queue, (at, self._seq, player, data))
+
+    def recv(self):
+        now = self.clock()
+        q = self._queue
+        while q and q[0][0] <= now:
+            _, _, player, data = heapq.heappop(q)
+            self.inner.send(player, data)
+        return self.inner.recv()
+
+    def close(self):
+        self.inner.close()
+
+
+class RollbackSession:
+    # sim: BomberSim(players=N)。local: このピアの player 番号。transport: send(player, data) / recv()
+    # advance(inp) を毎フレーム1回呼ぶ。戻り値は sim.tick の結果、相手待ちで進めなかった時は None
+    def __init__(self, sim, local, transport, delay=INPUT_DELAY, max_rollback=MAX_ROLLBACK):
+        n = sim.n_players
+        if not 0 <= local < n:
+            raise ValueError(f"local player must be 0..{n - 1}, got {local}")
+        self.sim = sim
+        self.local = local
+        self.transport = transport
+        self.delay = delay
+        self.max_rollback = max_rollback
+        self.n = n
+        self.frame = 0  # 次に tick するフレーム（= 済んだ tick 数）
+        # 確定入力 / 実際に tick に使った入力（予測込み）。index = frame % RING
+        self.inputs = [array("H", bytes(2 * RING)) for _ in range(n)]
+        self.used = [array("H", bytes(2 * RING)) for _ in range(n)]
+        # 入力が途切れずに届いている最後のフレーム。最初の delay フレームは全員 0 で確定
+        self.confirmed = [delay - 1] * n
+        self.acked = [delay - 1] * n  # 相手が受け取った自分の入力の最後のフレーム
+        # tick 前の状態のリングバッファ（frame % len）と、その長さ
+        self.snaps = [bytearray() for _ in range(max_rollback + 2)]
+        self.snap_len = [0] * len(self.snaps)
+        self._tick_inputs = [0] * n
+        self._out = bytearray(PACKET.size + MAX_SEND * INPUT.size)
+        self.status = PLAYING
+        # 非同期検出: 確定済みフレームの snapshot の CRC を交換して突き合わせる
+        self.next_check = CHECK_EVERY
+        self.check = (0, 0)       # 最後に計算した (frame, crc)
+        self.local_checks = {}
+        self.remote_checks = {}
+        self.desync = -1          # 食い違った最初のフレーム（-1 = なし）
+        # stats
+        self.rollbacks = 0
+        self.resim_frames = 0
+        self.max_depth = 0
+        self.stalls = 0
+
+    # --------------- Per-frame ---------------
+    def advance(self, inp):
+        rollback_to = self._poll()
+        if rollback_to < self.frame:
+            self._resimulate(rollback_to)
+        self._update_checks()
+
+        frame = self.frame
+        if frame - min(self.confirmed) > self.max_rollback:
+            # 予測が深くなりすぎたので相手を待つ（この間のローカル入力は捨てる）
+            self.stalls += 1
+            self._send()
+            return None
+        me = self.local
+        ahead = frame + self.delay
+        if self.confirmed[me] < ahead:
+            self.inputs[me][ahead % RING] = inp
+            self.confirmed[me] = ahead
+        status = self._tick(frame)
+        self.frame = frame + 1
+        self.status = status
+        self._send()
+        return status
+
+    def _tick(self, frame):
+        # 1フレーム: tick 前の状態を保存し、確定 or 予測した入力で進める
+        slot = frame % len(self.snaps)
+        self.snap_len[slot] = self.sim.snapshot(self.snaps[slot])
+        i = frame % RING
+        inputs = self._tick_inputs
+        for p in range(self.n):
+            if frame <= self.confirmed[p]:
+                v = self.inputs[p][i]
+            else:
+                v = self.inputs[p][self.confirmed[p] % RING] & HELD_MASK
+            inputs[p] = self.used[p][i] = v
+        return self.sim.tick(inputs)
+
+    def _resimulate(self, start):
+        # start の tick 前まで戻して、現在のフレームまでやり直す（音は鳴らし済みなので捨てる）
+        depth = self.frame - start
+        self.rollbacks += 1
+        self.resim_frames += depth
+        self.max_depth = max(self.max_depth, depth)
+        sim = self.sim
+        slot = start % len(self.snaps)
+        sim.restore(self.snaps[slot])
+        status = PLAYING
+        for f in range(start, self.frame):
+            status = self._tick(f)
+        sim.sounds.clear()
+        self.status = status
+
+    # --------------- Network ---------------
+    def _poll(self):
+        # 受信した入力を取り込み、予測と違った最初のフレームを返す（なければ self.frame）
+        rollback_to = self.frame
+        for data in self.transport.recv():
+            if len(data) < PACKET.size:
+                continue
+            magic, player, count, ack, start, check_frame, check_crc = PACKET.unpack_from(data)
+            if magic != MAGIC or not 0 <= player < self.n or player == self.local:
+                continue
+            if ack > self.acked[player]:
+                self.acked[player] = ack
+            if check_frame:
+                self._compare(check_frame, check_crc, self.remote_checks, self.local_checks)
+            conf = self.confirmed[player]
+            inputs, used = self.inputs[player], self.used[player]
+            off = PACKET.size
+            for f in range(start, start + min(count, (len(data) - off) // INPUT.size)):
+                if f == conf + 1:
+                    v = INPUT.unpack_from(data, off)[0]
+                    i = f % RING
+                    inputs[i] = v
+                    conf = f
+                    if f < rollback_to and used[i] != v:
+                        rollback_to = f
+                off += INPUT.size
+            self.confirmed[player] = conf
+        return rollback_to
+
+    def _send(self):
+        # ピアごとに、相手が未受信の自分の入力をまとめて送る
+        me = self.local
+        last = self.confirmed[me]
+        inputs = self.inputs[me]
+        buf = self._out
+        check_frame, check_crc = self.check
+        for p in range(self.n):
+            if p == me:
+                continue
+            start = max(self.acked[p] + 1, last - MAX_SEND + 1)
+            count = last - start + 1
+            PACKET.pack_into(buf, 0, MAGIC, me, count, self.confirmed[p], start, check_frame, check_crc)
+            off = PACKET.size
+            for f in range(start, last + 1):
+                INPUT.pack_into(buf, off, inputs[f % RING])
+                off += INPUT.size
+            self.transport.send(p, bytes(buf[:off]))
+
+    # --------------- Desync check ---------------
+    def _update_checks(self):
+        # frame F の tick 前の状態は、F-1 までの入力が全員分確定していれば正しい
+        limit = min(min(self.confirmed) + 1, self.frame - 1)
+        while self.next_check <= limit:
+            f = self.next_check
+            self.next_check += CHECK_EVERY
+            if self.frame - f >= len(self.snaps):
+                continue  # 取りこぼした（スナップショットがもう無い）
+            slot = f % len(self.snaps)
+            crc = zlib.crc32(memoryview(self.snaps[slot])[:self.snap_len[slot]])
+            self.check = (f, crc)
+            self._compare(f, crc, self.local_checks, self.remote_checks)
+
+    def _compare(self, frame, crc, mine, theirs):
+        other = theirs.pop(frame, None)
+        if other is None:
+            mine[frame] = crc
+            if len(mine) > 16:
+                del mine[min(mine)]
+        elif other != crc and self.desync < 0:
+            self.desync = frame
+
+
+def parse_peer(s):
+    host, port = s.rsplit(":", 1)
+    return host, int(port)
+
+
+# --------------- Headless versus over localhost ---------------
+def run(player, port, peers, frames, stage=1, seed=0, delay_ms=0, jitter_ms=0, loss=0.0):
+    # ランダム入力で frames フレーム対戦し、統計を返す。両ピアの最後の check が一致すれば同期している
+    n = len(peers) + 1
+    addrs = {}
+    for p, addr in enumerate(peers):
+        addrs[p if p < player else p + 1] = addr
+    transport = UdpTransport(port, addrs)
+    if delay_ms or jitter_ms or loss:
+        transport = LossyTransport(transport, delay_ms, jitter_ms, loss, seed=seed * 31 + player)
+    sim = BomberSim(stage, players=n)
+    session = RollbackSession(sim, player, transport)
+    rng = random.Random(seed * MAX_PLAYERS + player)
+    budget = 1.0 / FPS
+    resim_time = 0.0
+    rolls = 0
+    next_t = time.perf_counter()
+    try:
+        while session.frame < frames:
+            inp = rng.getrandbits(4)
+            inp |= (inp & rng.getrandbits(4)) << IN_PRESSED_SHIFT
+            if rng.random() < 0.05:
+                inp |= IN_BOMB
+            if session.status != PLAYING:
+                inp |= IN_RESTART
+            t0 = time.perf_counter()
+            session.advance(inp)
+            if session.rollbacks != rolls:
+                rolls = session.rollbacks
+                resim_time = max(resim_time, time.perf_counter() - t0)
+            sim.sounds.clear()
+            sim.dirty_tiles.clear()
+            next_t += budget
+            time.sleep(max(0.0, next_t - time.perf_counter()))
+        # 相手が最後の入力を受け取るまで少し送り続ける
+        for _ in range(FPS // 2):
+            session._poll()
+            session._send()
+            time.sleep(budget)
+    finally:
+        transport.close()
+    return session, resim_time
+
+
+def bench(stage=1, players=2, depth=MAX_ROLLBACK, reps=2000, seed=0):
+    # depth フレームの巻き戻し + 再シミュレーションにかかる時間（秒）
+    rng = random.Random(seed)
+    sim = BomberSim(stage, players=players)
+    bufs = [bytearray() for _ in range(depth + 1)]
+    inputs = [[rng.getrandbits(4) | (IN_BOMB if rng.random() < 0.05 else 0) for _ in range(players)]
+              for _ in range(depth)]
+    for _ in range(60):  # 爆弾や炎がある状態から測る
+        sim.tick(inputs[0])
+    sim.snapshot(bufs[0])
+    t0 = time.perf_counter()
+    for _ in range(reps):
+        sim.restore(bufs[0])
+        for k in range(depth):
+            sim.snapshot(bufs[k + 1])
+            sim.tick(inputs[k])
+        sim.sounds.clear()
+    return (time.perf_counter() - t0) / reps
+
+
+if __name__ == "__main__":
+    import argparse
+    ap = argparse.ArgumentParser(description="Bomber versus mode with rollback netcode (headless test peer).")
+    ap.add_argument("--player", type=int, default=0, help="this peer's player number")
+    ap.add_argument("--port", type=int, default=7700)
+    ap.add_argument("--peer", action="append", default=[], metavar="HOST:PORT",
+                    help="other peers in player order, skipping this one (repeat for 3-4 players)")
+    ap.add_argument("--frames", type=int, default=FPS * 60)
+    ap.add_argument("--stage", type=int, default=1)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--delay-ms", type=float, default=0)
+    ap.add_argument("--jitter-ms", type=float, default=0)
+    ap.add_argument("--loss", type=float, default=0.0, help="packet loss probability (0..1)")
+    ap.add_argument("--bench", action="store_true", help=f"time a {MAX_ROLLBACK}-frame rollback and exit")
+    args = ap.parse_args()
+
+    if args.bench:
+        dt = bench(args.stage)
+        print(f"{MAX_ROLLBACK}-frame rollback: {dt * 1e6:.0f}us ({dt * FPS * 100:.1f}% of a frame)")
+        raise SystemExit(0)
+    if not args.peer:
+        ap.error("at least one --peer is required")
+    session, worst = run(args.player, args.port, [parse_peer(p) for p in args.peer], args.frames,
+                         args.stage, args.seed, args.delay_ms, args.jitter_ms, args.loss)
+    avg = session.resim_frames / session.rollbacks if session.rollbacks else 0
+    f, crc = session.check
+    print(f"player {args.player}: {session.frame} frames, {session.rollbacks} rollbacks "
+          f"(avg {avg:.1f}, max {session.max_depth} frames, worst update {worst * 1000:.2f}ms), "
+          f"{session.stalls} stalls")
+    print(f"check frame {f} crc {crc:08x}" + (f", DESYNC at frame {session.desync}" if session.desync >= 0 else ""))
+    raise SystemExit(1 if session.desync >= 0 else 0)
@@ -0,0 +1,204 @@
+# Bomber-Pyxel input recording & headless replay
+#
+# Record while playing (one file per session; every stage attempt is a segment):
+#
+#   python Bomber.py --record run.bmr
+#
+# Replay without rendering, as fast as the CPU allows:
+#
+#   python bomber_replay.py run.bmr              # verify against the recorded hashes
+#   python bomber_replay.py run.bmr --every 600  # just print the rolling hash
+#
+# BomberSim is deterministic for a given (stage, layout variant, arena size) and
+# input sequence, so the file only holds those plus the per-tick input bitmasks.
+# Every `interval` ticks the recorder folds the sim state into a rolling hash and
+# stores it; replay recomputes it and reports the first checkpoint that differs,
+# which brackets where two runs diverged.
+#
+# File layout (little endian):
+#   header : magic "BMRP", version u8, interval u16
+#   records: (a u16, b u16), then
+#     a <  0x8000 : input a repeated for b ticks (run-length)
+#     a == SEGMENT: new stage attempt; stage u32, variant u8, w u8, h u8
+#     a == CHECK  : checkpoint; tick u32, digest[8]
+
+import hashlib
+import struct
+from array import array
+
+from bomber_sim import PLAYING, GAMEOVER, CLEAR, BomberSim
+
+MAGIC = b"BMRP"
+VERSION = 2
+HEADER = struct.Struct("<4sBH")
+REC = struct.Struct("<HH")
+SEG = struct.Struct("<IBBB")
+CHK = struct.Struct("<I8s")
+
+SEGMENT = 0xFFFF
+CHECK = 0xFFFE
+MAX_RUN = 0xFFFF
+
+# Checkpoint interval (ticks). 60 = once per second of play
+CHECK_EVERY = 60
+
+_PLAYER = struct.Struct("<2d4i?")
+_STEP = struct.Struct("<?2b2d2h")
+_BOMB = struct.Struct("<2B2hI")
+_ENEMY = struct.Struct("<2d2b?")
+
+
+def state_bytes(sim):
+    # ハッシュ用に sim の状態を直列化（描画用の dirty_tiles や sounds は含めない）
+    out = [struct.pack("<I", sim.frame)]
+    for p in sim.players:
+        out.append(_PLAYER.pack(p.x, p.y, p.bombs, p.power, p.lives, p.inv_frames, p.alive))
+        out.append(_STEP.pack(p.moving, p.dirx, p.diry, p.target_x, p.target_y, *(p.pass_tile or (-1, -1))))
+    out.append(bytes(sim.map.cells))
+    out.append(array("q", sim.flame_until).tobytes())
+    out.extend(_BOMB.pack(b.tx, b.ty, b.fuse, b.power, b.seq) for b in sim.bombs)
+    out.extend(_ENEMY.pack(e.x, e.y, e.dirx, e.diry, e.alive) for e in sim.enemies)
+    # 乱数の消費位置がずれたら即座に分かるように、AI とドロップの状態も入れる
+    out.append(struct.pack("<2Q", sim.rng_ai.state, sim.rng_loot.state))
+    return b"".join(out)
+
+
+def fold(digest, sim):
+    # rolling hash: 直前の digest と現在の状態から次の digest を作る
+    return hashlib.blake2b(digest + state_bytes(sim), digest_size=8).digest()
+
+
+class Recorder:
+    # Bomber.py から使う。begin(sim) をステージ開始ごとに、frame(inp) を sim.tick(inp) の後に呼ぶ
+    def __init__(self, path, interval=CHECK_EVERY):
+        self.interval = interval
+        self._f = open(path, "wb")
+        self._f.write(HEADER.pack(MAGIC, VERSION, interval))
+        self.sim = None
+        self._inp = None
+        self._run = 0
+
+    def begin(self, sim):
+        # セグメントの見出しは最初の tick で書く（一度も遊ばなかったステージは残さない）
+        self.sim = sim
+        self.ticks = 0
+        self.digest = bytes(8)
+
+    def frame(self, inp):
+        if self.ticks == 0:
+            sim = self.sim
+            self._flush_run()
+            self._f.write(REC.pack(SEGMENT, 0) + SEG.pack(sim.stage, sim.layout_variant, sim.gw, sim.gh))
+        if inp != self._inp or self._run == MAX_RUN:
+            self._flush_run()
+            self._inp = inp
+        self._run += 1
+        self.ticks += 1
+        if self.ticks % self.interval == 0:
+            self.digest = fold(self.digest, self.sim)
+            self._flush_run()
+            self._f.write(REC.pack(CHECK, 0) + CHK.pack(self.ticks, self.digest))
+            self._f.flush()  # 落ちても直前の1秒分までは残る
+
+    def _flush_run(self):
+        if self._run:
+            self._f.write(REC.pack(self._inp, self._run))
+        self._run = 0
+
+    def close(self):
+        if not self._f.closed:
+            self._flush_run()
+            self._f.close()
+
+
+class Segment:
+    __slots__ = ("stage", "variant", "size", "inputs", "checks")
+
+    def __init__(self, stage, variant, size):
+        self.stage = stage
+        self.variant = variant
+        self.size = size
+        self.inputs = array("H")  # tick ごとの入力
+        self.checks = {}          # tick -> digest
+
+
+def load(path):
+    # (interval, [Segment, ...])
+    with open(path, "rb") as f:
+        data = f.read()
+    magic, version, interval = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"{path}: not a Bomber replay (v{VERSION})")
+    segs = []
+    off = HEADER.size
+    end = len(data) - REC.size
+    while off <= end:
+        a, b = REC.unpack_from(data, off)
+        off += REC.size
+        if a == SEGMENT:
+            stage, variant, w, h = SEG.unpack_from(data, off)
+            off += SEG.size
+            segs.append(Segment(stage, variant, (w, h)))
+        elif a == CHECK:
+            tick, digest = CHK.unpack_from(data, off)
+            off += CHK.size
+            segs[-1].checks[tick] = digest
+        else:
+            segs[-1].inputs.extend(array("H", [a]) * b)
+    return interval, segs
+
+
+def replay(seg, every, vector_enemies=False):
+    # 1セグメントを描画なしで再生し、every tick ごとに (tick, digest) を返す。最後は (tick, status)
+    sim = BomberSim(seg.stage, size=seg.size, variant=seg.variant, vector_enemies=vector_enemies)
+    tick = sim.tick
+    sounds = sim.sounds
+    digest = bytes(8)
+    status = PLAYING
+    n = 0
+    for n, inp in enumerate(seg.inputs, 1):
+        status = tick(inp)
+        sounds.clear()
+        if n % every == 0:
+            digest = fold(digest, sim)
+            yield n, digest
+        if status != PLAYING:
+            break
+    yield n, status
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+    ap = argparse.ArgumentParser(description="Replay a recorded Bomber session headless.")
+    ap.add_argument("file")
+    ap.add_argument("--every", type=int, default=None,
+                    help="print the rolling hash every N ticks (default: the recorded interval, verified)")
+    ap.add_argument("--vector", action="store_true", help="use the NumPy enemy store")
+    ap.add_argument("--quiet", action="store_true", help="only print mismatches and the summary")
+    args = ap.parse_args()
+
+    interval, segs = load(args.file)
+    every = args.every or interval
+    verify = every == interval
+    names = {PLAYING: "playing", GAMEOVER: "gameover", CLEAR: "clear"}
+    total = mismatches = 0
+    t0 = time.perf_counter()
+    for k, seg in enumerate(segs):
+        w, h = seg.size
+        print(f"segment {k}: stage {seg.stage} variant {seg.variant} {w}x{h}, {len(seg.inputs)} ticks")
+        for tick, value in replay(seg, every, args.vector):
+            if isinstance(value, int):
+                total += tick
+                print(f"  end   {tick:8d} {names.get(value, value)}")
+                break
+            expect = seg.checks.get(tick) if verify else None
+            if expect is not None and expect != value:
+                mismatches += 1
+                print(f"  tick  {tick:8d} {value.hex()} MISMATCH (recorded {expect.hex()})")
+            elif not args.quiet:
+                print(f"  tick  {tick:8d} {value.hex()}" + (" ok" if expect is not None else ""))
+    dt = time.perf_counter() - t0
+    rate = f"{total / dt:.0f} ticks/sec" if dt > 0 else ""
+    print(f"{total} ticks in {dt:.2f}s ({rate}), {mismatches} mismatching checkpoints")
+    raise SystemExit(1 if mismatches else 0)
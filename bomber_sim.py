@@ -0,0 +1,975 @@
+# Bomber-Pyxel simulation core (no pyxel import; runs headless)
+#
+# Holds one stage worth of state (map, bombs, explosions, enemies, player,
+# grid-step state) and advances it one frame per tick() from an input bitmask.
+# Bomber.py wraps this with pyxel input/draw/sound; CI, soak tests and replays
+# can drive it directly:
+#
+#   sim = BomberSim(stage=1)
+#   status = sim.tick(IN_RIGHT | IN_BOMB)
+#
+# Sounds are not played here; tick() appends sound ids to sim.sounds and the
+# front-end flushes them.
+
+import hashlib
+import random
+import struct
+from array import array
+from dataclasses import dataclass
+
+# --------------- Constants ---------------
+TILE = 16
+GRID_W = 13
+GRID_H = 11
+HUD_H = 16
+W = GRID_W * TILE
+H = GRID_H * TILE + HUD_H
+FPS = 60
+
+# Tiles
+EMPTY, WALL, SOFT, PWR_FIRE, PWR_BOMB = 0, 1, 2, 4, 5
+
+# Game states
+TITLE, PLAYING, GAMEOVER, CLEAR = 0, 1, 2, 3
+
+# Params
+BOMB_FUSE_FRAMES = FPS * 2          # 2 seconds
+EXPLOSION_FRAMES = int(FPS * 0.35)
+
+# Player grid-step speed (pixels per frame). 16px（1タイル）を 8フレで移動 => 2.0 が目安
+PLAYER_STEP_SPEED = 2.0
+
+ENEMY_SPEED = 1.2
+_DIRS = ((1, 0), (-1, 0), (0, 1), (0, -1))  # 敵が進路を選ぶ順（乱数の消費順に効く）
+_SOLID = bytes(t in (WALL, SOFT) for t in range(256))  # タイル種別 -> 通れないなら 1（bytes.translate 用）
+MAX_ENEMIES = 6
+INITIAL_BOMBS = 1
+INITIAL_POWER = 2
+MAX_BOMBS_CAP = 8
+MAX_POWER_CAP = 8
+
+# Arena size limit (tiles per side; coordinates fit in one byte)
+MAX_ARENA = 255
+
+# Versus mode: up to four players, one per corner
+MAX_PLAYERS = 4
+
+# Enemy activity chunks: only enemies within ACTIVE_CHUNKS chunks of some
+# alive player's chunk are updated. 8-tile chunks +-1 cover the 13x11 view plus a
+# margin, and the whole default arena, so small stages behave as before.
+# Arenas no wider/taller than ACTIVE_CHUNKS + 1 chunks are always fully active
+# and skip the chunk bookkeeping.
+CHUNK = 8
+ACTIVE_CHUNKS = 1
+
+# Input bits (one int per tick). Low nibble = held direction,
+# next nibble = direction pressed this frame (btnp).
+IN_RIGHT, IN_LEFT, IN_DOWN, IN_UP = 1, 2, 4, 8
+IN_PRESSED_SHIFT = 4
+IN_BOMB = 1 << 8
+IN_RESTART = 1 << 9
+
+# Sound ids (pyxel.sounds[n] in the front-end)
+SND_BOMB, SND_BLAST, SND_PICKUP, SND_HURT, SND_CLEAR = 0, 1, 2, 3, 4
+
+# (direction, input bit) in the original key priority order: R, L, D, U
+DIR_BITS = (((1, 0), IN_RIGHT), ((-1, 0), IN_LEFT), ((0, 1), IN_DOWN), ((0, -1), IN_UP))
+
+
+def seed_for(stage):
+    return 1337 + stage * 97
+
+
+_M64 = (1 << 64) - 1
+
+
+class SmallRandom(random.Random):
+    # 状態が 64bit 整数1個の乱数（SplitMix64）。random() / choice() などは random.Random と同じ使い方。
+    # Mersenne Twister の状態（625 語）は getstate/setstate だけで 10µs 以上かかるので、
+    # 毎フレーム snapshot() する AI / ドロップのストリームはこちらを使う。
+    def seed(self, a=None):
+        if not isinstance(a, int):
+            a = int.from_bytes(hashlib.blake2b(str(a).encode(), digest_size=8).digest(), "little")
+        self.state = a & _M64
+        self.gauss_next = None
+
+    def getstate(self):
+        return self.state
+
+    def setstate(self, state):
+        self.state = state
+
+    def getrandbits(self, k):
+        if k > 64:
+            return super().getrandbits(k)
+        self.state = s = (self.state + 0x9E3779B97F4A7C15) & _M64
+        z = ((s ^ (s >> 30)) * 0xBF58476D1CE4E5B9) & _M64
+        z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & _M64
+        return (z ^ (z >> 31)) >> (64 - k)
+
+    def random(self):
+        return self.getrandbits(53) * (1.0 / (1 << 53))
+
+
+def stage_rngs(stage, variant=0):
+    # ステージ専用の乱数ストリーム（生成 / 敵AI / ドロップ）。グローバルな random は使わないので、
+    # 複数ステージを別スレッド・別プロセスで同時に生成・シミュレートしても結果は同じ。
+    # 生成ストリームは旧 random.seed(seed_for(stage)) と同じ系列なのでステージ配置は変わらない。
+    # variant > 0 は配置の引き直し用（ステージバンク生成で検証に落ちた時）
+    base = seed_for(stage)
+    gen = random.Random(base) if variant == 0 else random.Random(f"{base}:gen{variant}")
+    return gen, SmallRandom(f"{base}:ai"), SmallRandom(f"{base}:loot")
+
+
+def clamp(v, a, b):
+    return a if v < a else b if v > b else v
+
+
+def to_tile(px, py):
+    return int(px // TILE), int((py - HUD_H) // TILE)
+
+
+def to_pix(tx, ty, center=True):
+    x = tx * TILE + (TILE // 2 if center else 0)
+    y = ty * TILE + HUD_H + (TILE // 2 if center else 0)
+    return x, y
+
+
+class TileMap:
+    # タイルマップ。w*h マスを1本の bytearray に行優先で格納（index = ty * w + tx）。
+    # ホットパスは cells を直接読む。copy()/snapshot() は bytearray の丸ごとコピーで安い。
+    __slots__ = ("w", "h", "cells")
+
+    def __init__(self, w, h, fill=EMPTY, cells=None):
+        self.w = w
+        self.h = h
+        self.cells = bytearray([fill]) * (w * h) if cells is None else cells
+
+    def index(self, tx, ty):
+        return ty * self.w + tx
+
+    def in_bounds(self, tx, ty):
+        return 0 <= tx < self.w and 0 <= ty < self.h
+
+    def get(self, tx, ty):
+        return self.cells[ty * self.w + tx]
+
+    def set(self, tx, ty, t):
+        self.cells[ty * self.w + tx] = t
+
+    def fill(self, t):
+        self.cells[:] = bytearray([t]) * len(self.cells)
+
+    def count(self, t):
+        return self.cells.count(t)
+
+    def copy(self):
+        return TileMap(self.w, self.h, cells=bytearray(self.cells))
+
+    def snapshot(self):
+        return bytes(self.cells)
+
+    def restore(self, data):
+        self.cells[:] = data
+
+
+@dataclass
+class Bomb:
+    tx: int
+    ty: int
+    fuse: int
+    power: int
+    owner: int = 0                   # 置いたプレイヤーの番号（sim.players の index）
+    pass_through_owner: bool = True  # （互換のため残置; 実処理は Player.pass_tile で制御）
+    seq: int = 0                     # 設置順（誘爆の処理順に使う）
+
+
+@dataclass
+class Flame:
+    tiles: list  # list[(tx, ty)]
+    until: int   # この frame の炎更新で消える（flame_until と同じ値）
+
+
+@dataclass
+class Enemy:
+    x: float
+    y: float
+    dirx: int = 0
+    diry: int = 0
+    alive: bool = True
+
+    def rect(self):
+        return (self.x - 6, self.y - 6, self.x + 6, self.y + 6)
+
+
+@dataclass
+class Player:
+    x: float
+    y: float
+    bombs: int = INITIAL_BOMBS
+    power: int = INITIAL_POWER
+    lives: int = 3
+    inv_frames: int = 0
+    alive: bool = True
+    idx: int = 0
+    spawn: tuple = (1, 1)
+    input: int = 0                   # この tick の入力ビットマスク
+    # --- Grid-step movement state ---
+    moving: bool = False             # 現在、タイル間を移動中か
+    dirx: int = 0                    # 移動方向（-1/0/1）
+    diry: int = 0
+    target_x: float = 0.0            # 目標ピクセル座標（タイルセンター）
+    target_y: float = 0.0
+    pass_tile: tuple = None          # 爆弾すり抜けフラグ（自分が置いた直後のタイル）
+
+    def rect(self):
+        return (self.x - 6, self.y - 6, self.x + 6, self.y + 6)
+
+
+class BomberSim:
+    # size: アリーナのタイル数 (w, h)。最大 MAX_ARENA x MAX_ARENA
+    # n_enemies: 敵数の上書き（ホード用。None なら従来のステージ式）
+    # vector_enemies: True なら敵を bomber_horde.EnemyArrays（NumPy）で持つ
+    # bank: bomber_stagebank.StageBank。収録済みのステージは生成せずバンクからコピーする
+    # variant: 配置の引き直し番号（0 = 通常）
+    # players: 2..MAX_PLAYERS で対戦モード（四隅から開始、敵なし、最後の1人が勝ち）
+    def __init__(self, stage=1, n_enemies=None, vector_enemies=False, size=(GRID_W, GRID_H),
+                 bank=None, variant=0, players=1):
+        gw, gh = size
+        if not (5 <= gw <= MAX_ARENA and 5 <= gh <= MAX_ARENA):
+            raise ValueError(f"arena size must be 5..{MAX_ARENA} tiles per side, got {gw}x{gh}")
+        if not 1 <= players <= MAX_PLAYERS:
+            raise ValueError(f"players must be 1..{MAX_PLAYERS}, got {players}")
+        self.n_players = players
+        self.versus = players > 1
+        if self.versus and n_enemies is None:
+            n_enemies = 0
+        self.gw, self.gh = gw, gh
+        # どのチャンクも常に範囲内に入る広さならチャンク分けしない
+        span = (ACTIVE_CHUNKS + 1) * CHUNK
+        self.chunked = gw > span or gh > span
+        self.stage = stage
+        self.n_enemies = n_enemies
+        self.vector_enemies = vector_enemies
+        self.bank = bank
+        self.variant = variant
+        self.sounds = []
+        self.danger = None  # bomber_bot.DangerMap（ボットを付けた時だけ）。爆弾の増減を知らせる
+        self.prof = None    # frame_profiler.FrameProfiler。付けると tick の各処理を lap する
+        self.reset()
+
+    # --------------- Setup ---------------
+    def reset(self):
+        self.frame = 0
+        self.rng_gen, self.rng_ai, self.rng_loot = stage_rngs(self.stage, self.variant)
+        self.map = TileMap(self.gw, self.gh)
+        self.dirty_tiles = []  # 生成後に書き換わったタイル (tx, ty)。描画側が消費する
+        self.layout_variant = self.variant  # 実際に使った配置の variant（リプレイ用）
+        if self.bank is not None and self.n_enemies is None and self.bank.has(self.stage, self.gw, self.gh):
+            enemies = self.bank.load(self.stage, self.map)
+            self.layout_variant = self.bank.info(self.stage)[2]
+        else:
+            self._make_walls()
+            self._place_soft_blocks()
+            self._clear_spawn_area()
+            enemies = self._spawn_enemies()
+        self.explosions = []
+        # タイルごとの炎の消滅フレーム（map と同じ行優先 index）。> flame_now なら炎の中
+        self.flame_until = array("i", bytes(4 * self.gw * self.gh))
+        self.flame_now = 0
+        self.bombs = []
+        self.bomb_index = {}  # (tx, ty) -> Bomb。self.bombs と常に同期
+        self.bomb_seq = 0
+        self.players = []
+        for i, (sx, sy) in enumerate(self._spawn_points()):
+            x, y = to_pix(sx, sy)
+            self.players.append(Player(x, y, idx=i, spawn=(sx, sy), target_x=x, target_y=y))
+        self.player = self.players[0]
+        self.winner = -1  # 対戦モードの勝者（-1 = 未決着 / 引き分け）
+        self.over = False  # 対戦の決着がついた。以降はリスタートまで止まる
+        self.enemies = enemies
+        self.enemies_left = len(self.enemies)
+        if self.vector_enemies:
+            from bomber_horde import EnemyArrays
+            self.enemies = EnemyArrays(self.enemies)
+        elif self.chunked:
+            # チャンク -> 敵 index の集合（遠くの敵は動かさない）
+            self.enemy_chunks = {}
+            self.enemy_chunk_of = []
+            for i, e in enumerate(self.enemies):
+                key = self._chunk_of(e.x, e.y)
+                self.enemy_chunks.setdefault(key, set()).add(i)
+                self.enemy_chunk_of.append(key)
+
+        # ステージ開始時の状態。リスタートは再生成せずここへ restore する
+        self.start_state = bytearray()
+        self.snapshot(self.start_state)
+        if self.danger is not None:
+            self.danger.rebuild()
+
+    def snapshot(self, buf):
+        # 全状態を buf（bytearray、使い回し）に書く。戻り値は使ったバイト数
+        return snapshot(self, buf)
+
+    def restore(self, buf):
+        return restore(self, buf)
+
+    def _make_walls(self):
+        for x in range(self.gw):
+            for y in range(self.gh):
+                if x == 0 or y == 0 or x == self.gw - 1 or y == self.gh - 1:
+                    self.map.set(x, y, WALL)
+                elif x % 2 == 0 and y % 2 == 0:
+                    self.map.set(x, y, WALL)
+
+    def _place_soft_blocks(self):
+        for x in range(self.gw):
+            for y in range(self.gh):
+                if self.map.get(x, y) != EMPTY:
+                    continue
+                if self.rng_gen.random() < 0.70:
+                    self.map.set(x, y, SOFT)
+
+    def _spawn_points(self):
+        # 左上, 右下, 右上, 左下。柱（偶数, 偶数）に重ならないよう奇数座標に寄せる
+        x1 = self.gw - 2 if self.gw % 2 else self.gw - 3
+        y1 = self.gh - 2 if self.gh % 2 else self.gh - 3
+        return [(1, 1), (x1, y1), (x1, 1), (1, y1)][:self.n_players]
+
+    def _clear_spawn_area(self):
+        # スポーン地点から内側へ L 字に空ける
+        for sx, sy in self._spawn_points():
+            sgx = 1 if sx < self.gw // 2 else -1
+            sgy = 1 if sy < self.gh // 2 else -1
+            for dx, dy in [(0,0),(1,0),(0,1),(1,1),(2,1),(1,2)]:
+                tx, ty = sx + dx * sgx, sy + dy * sgy
+                if self.map.in_bounds(tx, ty) and self.map.get(tx, ty) == SOFT:
+                    self.map.set(tx, ty, EMPTY)
+
+    def _spawn_enemies(self):
+        # スポーン地点から 5 マス以上（マンハッタン距離）離れた空きマス。1人用では旧来の x + y > 6 と同じ
+        spawns = self._spawn_points()
+        spots = []
+        for x in range(1, self.gw - 1):
+            for y in range(1, self.gh - 1):
+                if self.map.get(x, y) == EMPTY and all(abs(x - sx) + abs(y - sy) > 4 for sx, sy in spawns):
+                    spots.append((x, y))
+        self.rng_gen.shuffle(spots)
+        if self.n_enemies is None:
+            n = clamp(3 + self.stage // 2, 3, MAX_ENEMIES)
+            n = n * (self.gw * self.gh) // (GRID_W * GRID_H)  # 大きいアリーナでは面積に比例
+        else:
+            n = self.n_enemies
+        enemies = []
+        for i in range(min(n, len(spots))):
+            px, py = to_pix(*spots[i])
+            e = Enemy(px, py, *self.rng_gen.choice([(1,0),(-1,0),(0,1),(0,-1)]))
+            enemies.append(e)
+        return enemies
+
+    # --------------- Tick ---------------
+    def tick(self, inp=0):
+        # 1フレーム進める。戻り値は PLAYING / GAMEOVER / CLEAR
+        # inp: 入力ビットマスク。対戦モードではプレイヤーごとの入力の並び（players と同じ順）
+        self.frame += 1
+        players = self.players
+        if self.versus:
+            restart = 0
+            for p, i in zip(players, inp):
+                p.input = i
+                restart |= i
+        else:
+            players[0].input = restart = inp
+        if restart & IN_RESTART:
+            self.restore(self.start_state)
+            return PLAYING
+        if self.over:
+            return GAMEOVER
+        for p in players:
+            if p.input & IN_BOMB and p.alive:
+                self._place_bomb(p)
+
+        for p in players:
+            if p.alive:
+                self._update_player_gridstep(p)
+        prof = self.prof
+        if prof is not None:
+            prof.lap("player")
+        self._update_bombs_and_flames()
+        if prof is not None:
+            prof.lap("bombs")
+        self._update_enemies()
+        if prof is not None:
+            prof.lap("enemies")
+
+        if self.versus:
+            return self._versus_status()
+        if self.player.lives <= 0:
+            return GAMEOVER
+        if not self._any_enemy_alive():
+            self.sounds.append(SND_CLEAR)
+            return CLEAR
+        return PLAYING
+
+    def _versus_status(self):
+        # 残り1人（または全滅）で決着
+        left = 0
+        for p in self.players:
+            if p.alive:
+                left += 1
+                last = p.idx
+        if left > 1:
+            return PLAYING
+        # 決着した tick だけ勝者を決めて音を鳴らす
+        self.over = True
+        self.winner = last if left else -1
+        self.sounds.append(SND_CLEAR)
+        return GAMEOVER
+
+    def _any_enemy_alive(self):
+        if self.vector_enemies:
+            return self.enemies.any_alive()
+        return self.enemies_left > 0
+
+    def _chunk_of(self, px, py):
+        tx, ty = to_tile(px, py)
+        return tx // CHUNK, ty // CHUNK
+
+    def player_chunks(self):
+        # 生きているプレイヤーのいるチャンク（重複なし）
+        return {self._chunk_of(p.x, p.y) for p in self.players if p.alive}
+
+    def _active_enemy_ids(self):
+        # 生きているプレイヤー全員の周辺チャンクの和に入る敵 index（元のリスト順 = 乱数消費順）
+        if not self.chunked:
+            return [i for i, e in enumerate(self.enemies) if e.alive]
+        keys = set()
+        for pcx, pcy in self.player_chunks():
+            for cx in range(pcx - ACTIVE_CHUNKS, pcx + ACTIVE_CHUNKS + 1):
+                for cy in range(pcy - ACTIVE_CHUNKS, pcy + ACTIVE_CHUNKS + 1):
+                    keys.add((cx, cy))
+        ids = []
+        for key in keys:
+            bucket = self.enemy_chunks.get(key)
+            if bucket:
+                ids.extend(bucket)
+        ids.sort()
+        return ids
+
+    # --------------- Player (grid-step) ---------------
+    def _is_solid_tile(self, tx, ty):
+        return not self.map.in_bounds(tx, ty) or self.map.get(tx, ty) == WALL
+
+    def _is_blocking_tile(self, tx, ty):
+        if not self.map.in_bounds(tx, ty):
+            return True
+        t = self.map.cells[ty * self.gw + tx]
+        if t == WALL or t == SOFT:
+            return True
+        return (tx, ty) in self.bomb_index
+
+    def _bomb_at(self, tx, ty):
+        return self.bomb_index.get((tx, ty))
+
+    def _read_dir_priority(self, p):
+        # まず「押された瞬間(btnp)」を優先、なければ「押されている(btn)」順で採用
+        pressed = p.input >> IN_PRESSED_SHIFT
+        for d, bit in DIR_BITS:
+            if pressed & bit:
+                return d
+        for d, bit in DIR_BITS:
+            if p.input & bit:
+                return d
+        return 0, 0
+
+    def _start_step_if_possible(self, p, dx, dy):
+        if dx == 0 and dy == 0:
+            return False
+        tx, ty = to_tile(p.x, p.y)
+        ntx, nty = tx + dx, ty + dy
+        if not self.map.in_bounds(ntx, nty):
+            return False
+        if self._is_blocking_tile(ntx, nty):
+            return False
+        p.moving = True
+        p.dirx, p.diry = dx, dy
+        p.target_x, p.target_y = to_pix(ntx, nty)
+        return True
+
+    def _update_player_gridstep(self, p):
+        # すり抜け解除：プレイヤー矩形が爆弾タイル矩形と重ならなくなったら解除
+        if p.pass_tile:
+            txp, typ = p.pass_tile
+            x0r, y0r, x1r, y1r = p.x - 6, p.y - 6, p.x + 6, p.y + 6
+            bx0, by0 = txp * TILE, typ * TILE + HUD_H
+            bx1, by1 = bx0 + TILE, by0 + TILE
+            if (x1r <= bx0 or x0r >= bx1 or y1r <= by0 or y0r >= by1):
+                p.pass_tile = None
+
+        # 現在タイル中心かを確認（誤差吸収のため丸め）
+        tx, ty = to_tile(p.x, p.y)
+        cx, cy = to_pix(tx, ty)
+        if abs(p.x - cx) < 0.5 and abs(p.y - cy) < 0.5:
+            p.x, p.y = cx, cy
+            at_center = True
+        else:
+            at_center = False
+
+        # 次の一歩を開始（中心にいる＆停止中のときにのみ方向入力を読む）
+        if not p.moving and at_center:
+            dx, dy = self._read_dir_priority(p)
+            self._start_step_if_possible(p, dx, dy)
+
+        # 移動中なら目標センターへ直進
+        if p.moving:
+            spd = PLAYER_STEP_SPEED
+            if p.dirx != 0:
+                nxt = p.x + p.dirx * spd
+                if (p.dirx > 0 and nxt >= p.target_x) or (p.dirx < 0 and nxt <= p.target_x):
+                    p.x = p.target_x
+                    p.moving = False
+                else:
+                    p.x = nxt
+            elif p.diry != 0:
+                nyt = p.y + p.diry * spd
+                if (p.diry > 0 and nyt >= p.target_y) or (p.diry < 0 and nyt <= p.target_y):
+                    p.y = p.target_y
+                    p.moving = False
+                else:
+                    p.y = nyt
+
+            # タイルに到達した瞬間、同じ方向が押されていれば自動で次の一歩を開始
+            if not p.moving:
+                dx, dy = self._read_dir_priority(p)
+                # 同方向が押されているなら連続ステップ（押しっぱなし歩き）
+                if (dx, dy) == (p.dirx, p.diry):
+                    if not self._start_step_if_possible(p, dx, dy):
+                        p.dirx = p.diry = 0
+                else:
+                    # 別方向入力があればそちらを優先（L字ターン）
+                    if not self._start_step_if_possible(p, dx, dy):
+                        p.dirx = p.diry = 0
+
+        # ピックアップ判定（タイルベースでOK）
+        ptx, pty = to_tile(p.x, p.y)
+        tile = self.map.get(ptx, pty)
+        if tile == PWR_BOMB:
+            self.map.set(ptx, pty, EMPTY)
+            self.dirty_tiles.append((ptx, pty))
+            p.bombs = min(MAX_BOMBS_CAP, p.bombs + 1)
+            self.sounds.append(SND_PICKUP)
+        elif tile == PWR_FIRE:
+            self.map.set(ptx, pty, EMPTY)
+            self.dirty_tiles.append((ptx, pty))
+            p.power = min(MAX_POWER_CAP, p.power + 1)
+            self.sounds.append(SND_PICKUP)
+
+        # 炎ダメージ
+        if p.inv_frames > 0:
+            p.inv_frames -= 1
+        else:
+            if self._tile_in_flame(ptx, pty):
+                self._hurt_player(p)
+
+    def _hurt_player(self, p):
+        p.lives -= 1
+        p.inv_frames = FPS
+        self.sounds.append(SND_HURT)
+        if self.versus and p.lives <= 0:
+            p.alive = False  # 対戦モードでは脱落（1人用はそのまま GAMEOVER）
+        p.x, p.y = to_pix(*p.spawn)
+        # 移動状態をリセット
+        p.moving = False
+        p.dirx = p.diry = 0
+        p.target_x, p.target_y = p.x, p.y
+
+    # --------------- Bombs / Explosions ---------------
+    def _place_bomb(self, p):
+        # 自分が設置可能上限まで
+        placed = 0
+        for b in self.bombs:
+            if b.owner == p.idx:
+                placed += 1
+        if placed >= p.bombs:
+            return
+        tx, ty = to_tile(p.x, p.y)
+        if self._is_solid_tile(tx, ty) or self._bomb_at(tx, ty):
+            return
+        self._add_bomb(Bomb(tx, ty, BOMB_FUSE_FRAMES, p.power, p.idx, True))
+        p.pass_tile = (tx, ty)  # 設置タイル在室中はすり抜け
+        self.sounds.append(SND_BOMB)
+
+    def place_bomb(self, tx, ty, fuse=BOMB_FUSE_FRAMES, power=INITIAL_POWER, owner=0):
+        # スクリプト・ベンチ用。所持数やプレイヤーの位置は見ずに (tx, ty) へ爆弾を置き、その Bomb を返す
+        if self._is_solid_tile(tx, ty) or self.map.get(tx, ty) == SOFT or self._bomb_at(tx, ty):
+            raise ValueError(f"cannot place a bomb on tile ({tx}, {ty})")
+        bomb = Bomb(tx, ty, fuse, power, owner, False)
+        self._add_bomb(bomb)
+        return bomb
+
+    def _add_bomb(self, bomb: Bomb):
+        bomb.seq = self.bomb_seq
+        self.bomb_seq += 1
+        self.bombs.append(bomb)
+        self.bomb_index[(bomb.tx, bomb.ty)] = bomb
+        if self.danger is not None:
+            # 置いた tick のうちに導火線が1減るので、起爆はこのフレーム + fuse - 1
+            self.danger.add(bomb, self.frame + bomb.fuse - 1)
+
+    def blast_tiles(self, tx, ty, power):
+        # (tx, ty) に威力 power の爆弾があった場合の炎タイル（壁で止まり、ソフトブロックは含めて止まる）
+        tiles = [(tx, ty)]
+        for dx, dy in [(1,0),(-1,0),(0,1),(0,-1)]:
+            for r in range(1, power + 1):
+                x, y = tx + dx * r, ty + dy * r
+                if not self.map.in_bounds(x, y):
+                    break
+                if self.map.get(x, y) == WALL:
+                    break
+                tiles.append((x, y))
+                if self.map.get(x, y) == SOFT:
+                    break
+        return tiles
+
+    def _explode(self, bomb: Bomb):
+        # 1個分の爆風（現在のマップで射線を決め、ソフトブロックを壊す）。炎タイルを返す
+        tiles = self.blast_tiles(bomb.tx, bomb.ty, bomb.power)
+
+        # Destroy soft blocks and maybe spawn powerups
+        for tx, ty in tiles:
+            if self.map.in_bounds(tx, ty) and self.map.get(tx, ty) == SOFT:
+                roll = self.rng_loot.random()
+                if roll < 0.06:
+                    self.map.set(tx, ty, PWR_BOMB)
+                elif roll < 0.12:
+                    self.map.set(tx, ty, PWR_FIRE)
+                else:
+                    self.map.set(tx, ty, EMPTY)
+                self.dirty_tiles.append((tx, ty))
+        return tiles
+
+    def _detonate(self, roots):
+        # 誘爆の解決（再帰なし・ワークリスト）。旧再帰版と同じく「深さ優先・設置順」で
+        # 起爆するので、壊れるブロックとパワーアップ抽選の順序は変わらない。
+        stack = list(reversed(roots))
+        flame = {}  # このフレームの炎タイル（dict で重複排除 & 順序保持）
+        exploded = []
+        while stack:
+            bomb = stack.pop()
+            key = (bomb.tx, bomb.ty)
+            if self.bomb_index.get(key) is not bomb:
+                continue  # 既に誘爆済み
+            del self.bomb_index[key]
+            exploded.append(bomb)
+            tiles = self._explode(bomb)
+            chained = []
+            for t in tiles:
+                flame[t] = True
+                other = self.bomb_index.get(t)
+                if other is not None:
+                    chained.append(other)
+            # Chain reaction（設置順に処理されるよう逆順で積む）
+            chained.sort(key=lambda b: b.seq, reverse=True)
+            stack.extend(chained)
+        if not flame:
+            return
+
+        self.bombs = [b for b in self.bombs if self.bomb_index.get((b.tx, b.ty)) is b]
+        if self.danger is not None:
+            self.danger.remove(exploded)
+        tiles = list(flame)
+        until = self.frame + EXPLOSION_FRAMES - 1
+        for tx, ty in tiles:
+            i = ty * self.gw + tx
+            if self.flame_until[i] < until:
+                self.flame_until[i] = until
+        self.explosions.append(Flame(tiles, until))
+        self.sounds.append(SND_BLAST)
+
+    def _tile_in_flame(self, tx, ty):
+        return self.flame_until[ty * self.gw + tx] > self.flame_now
+
+    def _update_bombs_and_flames(self):
+        # 炎の時計を進める（プレイヤー判定は前フレームの炎、敵判定は今フレームの炎を見る）
+        self.flame_now = self.frame
+        # Fuse
+        expired = []
+        for b in self.bombs:
+            b.fuse -= 1
+            if b.fuse <= 0:
+                expired.append(b)
+        if expired:
+            self._detonate(expired)
+        # Flames（until は発生順に単調増加なので先頭から消すだけ）
+        while self.explosions and self.explosions[0].until <= self.flame_now:
+            self.explosions.pop(0)
+
+    # --------------- Enemies ---------------
+    def _solid_tiles(self):
+        # 通れないタイル（壁 / ソフト / 爆弾）を 1 にした map と同じ並びの bytearray
+        solid = self.map.cells.translate(_SOLID)
+        gw = self.gw
+        for tx, ty in self.bomb_index:
+            solid[ty * gw + tx] = 1
+        return solid
+
+    def _rect_vs_blocking(self, solid, x0, y0, x1, y1):
+        # 矩形に重なるタイルに通れないものがあるか（範囲外は壁扱い）。solid は _solid_tiles()
+        gw, gh = self.gw, self.gh
+        min_ty, max_ty = int((y0 - HUD_H) // TILE), int((y1 - HUD_H) // TILE)
+        for tx in range(int(x0 // TILE), int(x1 // TILE) + 1):
+            for ty in range(min_ty, max_ty + 1):
+                if 0 <= tx < gw and 0 <= ty < gh and not solid[ty * gw + tx]:
+                    continue
+                bx0, by0 = tx * TILE, ty * TILE + HUD_H
+                if not (x1 <= bx0 or x0 >= bx0 + TILE or y1 <= by0 or y0 >= by0 + TILE):
+                    return True
+        return False
+
+    def _update_enemies(self):
+        if self.vector_enemies:
+            self.enemies.update(self)
+            return
+        active = self._active_enemy_ids()
+        # ホットループなので to_tile / to_pix / _is_blocking_tile を展開し、属性はローカルに取る
+        enemies = self.enemies
+        chunked = self.chunked
+        chunks, chunk_of = (self.enemy_chunks, self.enemy_chunk_of) if chunked else (None, None)
+        gw, gh = self.gw, self.gh
+        # 敵の処理中はマップも爆弾も変わらないので、通れないタイルは tick に1回まとめて引く
+        solid = self._solid_tiles()
+        flame_until, flame_now = self.flame_until, self.flame_now
+        rng = self.rng_ai
+        blocked = self._rect_vs_blocking
+        spd = ENEMY_SPEED
+        half = TILE // 2
+        for i in active:
+            e = enemies[i]
+            ex, ey = e.x, e.y
+            tx, ty = int(ex // TILE), int((ey - HUD_H) // TILE)
+            if flame_until[ty * gw + tx] > flame_now:
+                e.alive = False
+                self.enemies_left -= 1
+                if chunked:
+                    chunks[chunk_of[i]].discard(i)
+                continue
+
+            cx, cy = tx * TILE + half, ty * TILE + HUD_H + half
+            if abs(ex - cx) < 1 and abs(ey - cy) < 1:
+                ex, ey = cx, cy
+                choices = []
+                for dx, dy in _DIRS:
+                    ntx, nty = tx + dx, ty + dy
+                    if not (0 <= ntx < gw and 0 <= nty < gh) or solid[nty * gw + ntx]:
+                        continue
+                    choices.append((dx, dy))
+                if (e.dirx, e.diry) in choices and rng.random() < 0.7:
+                    pass
+                else:
+                    if choices:
+                        e.dirx, e.diry = rng.choice(choices)
+
+            # 軸ごとの移動（方向0の軸は位置が変わらないので判定を省略）
+            if e.dirx:
+                nx = ex + e.dirx * spd
+                if not blocked(solid, nx - 6, ey - 6, nx + 6, ey + 6):
+                    ex = nx
+            if e.diry:
+                ny = ey + e.diry * spd
+                if not blocked(solid, ex - 6, ny - 6, ex + 6, ny + 6):
+                    ey = ny
+            e.x, e.y = ex, ey
+
+            if chunked:
+                key = (int(ex // TILE) // CHUNK, int((ey - HUD_H) // TILE) // CHUNK)
+                if key != chunk_of[i]:
+                    chunks[chunk_of[i]].discard(i)
+                    chunks.setdefault(key, set()).add(i)
+                    chunk_of[i] = key
+
+        # Touch damage（無敵でない生存プレイヤーが居る時だけ。当たったプレイヤーは無敵になるので以降は外れる）
+        targets = [p for p in self.players if p.inv_frames == 0 and p.alive]
+        if not targets:
+            return
+        for i in active:
+            e = enemies[i]
+            if not e.alive:
+                continue
+            ex0, ey0, ex1, ey1 = e.x - 6, e.y - 6, e.x + 6, e.y + 6
+            for p in targets:
+                if p.inv_frames == 0:
+                    px0, py0, px1, py1 = p.x - 6, p.y - 6, p.x + 6, p.y + 6
+                    if not (px1 < ex0 or px0 > ex1 or py1 < ey0 or py0 > ey1):
+                        self._hurt_player(p)
+
+
+# --------------- Snapshot / restore ---------------
+# snapshot(buf) は sim の全状態を1本の bytearray に詰める（rollback / rewind / リトライ用）。
+# buf は使い回す前提で、足りない時だけ伸ばす。レイアウト:
+#   _SNAP_HEAD（rng_ai / rng_loot の状態と対戦の決着を含む）, players[n] x _SNAP_PLAYER,
+#   map cells[w*h], flame_until[w*h] (i32),
+#   bombs[n] x _SNAP_BOMB, explosions[n] x (_SNAP_FLAME + tiles[k] x (tx u8, ty u8)),
+#   enemies（リスト版は _SNAP_ENEMY の並び、NumPy 版は列ごとの生バイト）
+# 生成用の rng_gen はステージ生成後は使われないので含めない。
+_SNAP_HEAD = struct.Struct("<3i2Q4Ii?")
+_SNAP_PLAYER = struct.Struct("<2d4i?" "I?2b2d2h")
+_SNAP_BOMB = struct.Struct("<2Bh3BI")
+_SNAP_FLAME = struct.Struct("<iI")
+_SNAP_ENEMY = struct.Struct("<2d2b?")
+
+
+def _raw(a):
+    # array / ndarray を1バイト単位の memoryview に（コピーなし）
+    return memoryview(a).cast("B")
+
+
+def snapshot(sim, buf):
+    # 書き込んだバイト数を返す
+    cells = sim.map.cells
+    n = len(cells)
+    players = sim.players
+    bombs = sim.bombs
+    flames = sim.explosions
+    n_flame_tiles = sum(len(f.tiles) for f in flames)
+    vec = sim.vector_enemies
+    n_enemies = len(sim.enemies)
+    enemy_size = n_enemies * (8 + 8 + 8 + 8 + 1 if vec else _SNAP_ENEMY.size)
+    need = (_SNAP_HEAD.size + len(players) * _SNAP_PLAYER.size + n * 5 + len(bombs) * _SNAP_BOMB.size
+            + len(flames) * _SNAP_FLAME.size + 2 * n_flame_tiles + enemy_size)
+    if len(buf) < need:
+        buf.extend(bytes(need - len(buf)))
+    mv = memoryview(buf)
+    _SNAP_HEAD.pack_into(
+        buf, 0,
+        sim.frame, sim.flame_now, sim.bomb_seq, sim.rng_ai.state, sim.rng_loot.state,
+        len(players), len(bombs), len(flames), n_enemies, sim.winner, sim.over)
+    off = _SNAP_HEAD.size
+    for p in players:
+        ptx, pty = p.pass_tile or (-1, -1)
+        _SNAP_PLAYER.pack_into(
+            buf, off,
+            p.x, p.y, p.bombs, p.power, p.lives, p.inv_frames, p.alive,
+            p.input, p.moving, p.dirx, p.diry, p.target_x, p.target_y, ptx, pty)
+        off += _SNAP_PLAYER.size
+    mv[off:off + n] = cells
+    off += n
+    mv[off:off + 4 * n] = _raw(sim.flame_until)
+    off += 4 * n
+    for b in bombs:
+        _SNAP_BOMB.pack_into(buf, off, b.tx, b.ty, b.fuse, b.power, b.owner, b.pass_through_owner, b.seq)
+        off += _SNAP_BOMB.size
+    for f in flames:
+        k = len(f.tiles)
+        _SNAP_FLAME.pack_into(buf, off, f.until, k)
+        off += _SNAP_FLAME.size
+        mv[off:off + 2 * k] = bytes([c for t in f.tiles for c in t])
+        off += 2 * k
+    if vec:
+        es = sim.enemies
+        for col in (es.x, es.y, es.dirx, es.diry, es.alive):
+            raw = _raw(col)
+            mv[off:off + len(raw)] = raw
+            off += len(raw)
+    else:
+        for e in sim.enemies:
+            _SNAP_ENEMY.pack_into(buf, off, e.x, e.y, e.dirx, e.diry, e.alive)
+            off += _SNAP_ENEMY.size
+    return off
+
+
+def restore(sim, buf):
+    # snapshot() と同じ stage / アリーナの sim に戻す。描画側には変化したタイルを dirty_tiles で知らせる
+    (sim.frame, sim.flame_now, sim.bomb_seq, sim.rng_ai.state, sim.rng_loot.state,
+     n_players, n_bombs, n_flames, n_enemies, sim.winner, sim.over) = _SNAP_HEAD.unpack_from(buf, 0)
+    off = _SNAP_HEAD.size
+    for p in sim.players:
+        (p.x, p.y, p.bombs, p.power, p.lives, p.inv_frames, p.alive,
+         p.input, p.moving, p.dirx, p.diry, p.target_x, p.target_y, ptx, pty) = _SNAP_PLAYER.unpack_from(buf, off)
+        p.pass_tile = None if ptx < 0 else (ptx, pty)
+        off += _SNAP_PLAYER.size
+    mv = memoryview(buf)
+
+    cells = sim.map.cells
+    n = len(cells)
+    new = mv[off:off + n]
+    if cells != new:
+        gw = sim.gw
+        sim.dirty_tiles.extend((i % gw, i // gw) for i, (a, b) in enumerate(zip(cells, new)) if a != b)
+        cells[:] = new
+    off += n
+    _raw(sim.flame_until)[:] = mv[off:off + 4 * n]
+    off += 4 * n
+
+    sim.bombs = []
+    sim.bomb_index = {}
+    for _ in range(n_bombs):
+        tx, ty, fuse, power, owner, pass_owner, seq = _SNAP_BOMB.unpack_from(buf, off)
+        off += _SNAP_BOMB.size
+        b = Bomb(tx, ty, fuse, power, owner, bool(pass_owner), seq)
+        sim.bombs.append(b)
+        sim.bomb_index[(tx, ty)] = b
+    sim.explosions = []
+    for _ in range(n_flames):
+        until, k = _SNAP_FLAME.unpack_from(buf, off)
+        off += _SNAP_FLAME.size
+        raw = mv[off:off + 2 * k]
+        sim.explosions.append(Flame(list(zip(raw[0::2], raw[1::2])), until))
+        off += 2 * k
+
+    if sim.vector_enemies:
+        es = sim.enemies
+        for col in (es.x, es.y, es.dirx, es.diry, es.alive):
+            raw = _raw(col)
+            raw[:] = mv[off:off + len(raw)]
+            off += len(raw)
+    else:
+        # チャンク表は位置か生死が変わった敵だけ付け替える
+        chunked = sim.chunked
+        if chunked:
+            chunks, chunk_of = sim.enemy_chunks, sim.enemy_chunk_of
+        size = n_enemies * _SNAP_ENEMY.size
+        left = 0
+        for i, (e, (x, y, dx, dy, alive)) in enumerate(zip(sim.enemies, _SNAP_ENEMY.iter_unpack(mv[off:off + size]))):
+            if x != e.x or y != e.y or alive != e.alive:
+                e.x, e.y, e.alive = x, y, alive
+                if chunked:
+                    chunks[chunk_of[i]].discard(i)
+                    key = chunk_of[i] = sim._chunk_of(x, y)
+                    if alive:
+                        chunks.setdefault(key, set()).add(i)
+            e.dirx, e.diry = dx, dy
+            left += alive
+        sim.enemies_left = left
+        off += size
+    if sim.danger is not None:
+        sim.danger.rebuild()
+    return off
+
+
+# --------------- Headless soak / benchmark ---------------
+def soak(stage=1, ticks=100000, seed=0):
+    # ランダム入力で回し続ける（例外が出ないか & ticks/sec の確認用）
+    import time
+    rng = random.Random(seed)
+    sim = BomberSim(stage)
+    t0 = time.perf_counter()
+    for _ in range(ticks):
+        inp = rng.getrandbits(4) | (rng.getrandbits(4) << IN_PRESSED_SHIFT)
+        if rng.random() < 0.05:
+            inp |= IN_BOMB
+        if sim.tick(inp) != PLAYING:
+            sim.reset()
+        sim.sounds.clear()
+        sim.dirty_tiles.clear()
+    dt = time.perf_counter() - t0
+    return ticks / dt if dt > 0 else float("inf")
+
+
+if __name__ == "__main__":
+    import argparse
+    ap = argparse.ArgumentParser(description="Run the Bomber simulation headless.")
+    ap.add_argument("--stage", type=int, default=1)
+    ap.add_argument("--ticks", type=int, default=100000)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+    print(f"{soak(args.stage, args.ticks, args.seed):.0f} ticks/sec")
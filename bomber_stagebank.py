@@ -0,0 +1,207 @@
+# Bomber-Pyxel stage bank: pre-generated, validated stage layouts
+#
+# Build a bank (layouts are generated across a process pool):
+#
+#   python bomber_stagebank.py --out bomber_stages.bin --count 5000 --size 13x11
+#
+# Each stage is generated exactly as BomberSim would (same seeds), then checked:
+#   - reachable : every open / soft tile connects to the spawn tile (walls only block)
+#   - safe start: from the spawn, the player can drop a bomb and walk (over empty
+#                 tiles, before the fuse runs out) to a tile outside its blast
+# A stage that fails is re-rolled with variant 1, 2, ... (see stage_rngs) until it
+# passes; if none of MAX_VARIANTS passes the build stops with an error. The bank
+# stores the final tiles and enemy spawns plus a difficulty score.
+#
+# At runtime BomberSim(bank=StageBank(path)) memory-maps the file, and a stage
+# transition copies one slice of bytes into the TileMap instead of generating.
+# Records not flagged FLAG_VALID (from another build) are skipped: the sim
+# generates those stages live.
+#
+# File layout (little endian):
+#   header : magic "BMBK", version u8, w u8, h u8, pad, first_stage u32, count u32, enemy_cap u32
+#   record : stage u32, score u16, flags u8, variant u8, n_enemies u16,
+#            tiles[w*h] (TileMap.cells), enemies[enemy_cap] x (tx u8, ty u8, dir u8)
+
+import mmap
+import struct
+from collections import deque
+
+from bomber_sim import (
+    GRID_W, GRID_H, MAX_ENEMIES, TILE, BOMB_FUSE_FRAMES, PLAYER_STEP_SPEED, INITIAL_POWER,
+    EMPTY, WALL, SOFT,
+    BomberSim, Enemy, to_pix, to_tile,
+)
+
+MAGIC = b"BMBK"
+VERSION = 1
+HEADER = struct.Struct("<4sBBBxIII")
+REC_HEAD = struct.Struct("<IHBBH")
+
+FLAG_REACHABLE = 1
+FLAG_SAFE_START = 2
+FLAG_VALID = FLAG_REACHABLE | FLAG_SAFE_START
+MAX_VARIANTS = 64
+
+# Enemy start directions, indexed by the dir byte
+DIRS = [(1, 0), (-1, 0), (0, 1), (0, -1)]
+
+
+def enemy_cap(w, h):
+    # BomberSim のデフォルト敵数の上限（面積比例）
+    return max(MAX_ENEMIES, MAX_ENEMIES * (w * h) // (GRID_W * GRID_H))
+
+
+def record_size(w, h):
+    return REC_HEAD.size + w * h + enemy_cap(w, h) * 3
+
+
+# --------------- Validation ---------------
+def _bfs(cells, w, h, start, passable):
+    # タイル index ごとの歩数（到達不能は -1）
+    dist = [-1] * (w * h)
+    dist[start] = 0
+    q = deque([start])
+    while q:
+        i = q.popleft()
+        d = dist[i] + 1
+        for j in (i - 1, i + 1, i - w, i + w):
+            if dist[j] < 0 and passable(cells[j]):
+                dist[j] = d
+                q.append(j)
+    return dist
+
+
+def check_layout(cells, w, h, enemy_tiles):
+    # (flags, score) を返す。外周は必ず壁なので bfs の範囲チェックは不要
+    spawn = 1 * w + 1
+    flags = 0
+
+    # 壁以外のすべてのタイルにスポーンから届くか（ソフトブロックは壊せるので通行可）
+    through = _bfs(cells, w, h, spawn, lambda t: t != WALL)
+    if all(through[i] >= 0 for i in range(w * h) if cells[i] != WALL):
+        flags |= FLAG_REACHABLE
+
+    # 初手の爆弾から逃げられるか（空きタイルだけを歩いて、導火線が尽きる前に爆風の外へ）
+    open_dist = _bfs(cells, w, h, spawn, lambda t: t == EMPTY)
+    blast = {spawn}
+    for step in (1, -1, w, -w):
+        for r in range(1, INITIAL_POWER + 1):
+            j = spawn + step * r
+            if cells[j] == WALL:
+                break
+            blast.add(j)
+            if cells[j] == SOFT:
+                break
+    max_steps = int(BOMB_FUSE_FRAMES * PLAYER_STEP_SPEED) // TILE
+    if any(0 <= d <= max_steps and i not in blast for i, d in enumerate(open_dist)):
+        flags |= FLAG_SAFE_START
+
+    # 難易度：敵の数、ソフトブロック密度、スポーン近くの敵（ブロックを壊しながらの歩数）
+    open_tiles = sum(1 for t in cells if t != WALL)
+    soft = cells.count(SOFT)
+    score = 10 * len(enemy_tiles) + 100 * soft // max(1, open_tiles)
+    for tx, ty in enemy_tiles:
+        d = through[ty * w + tx]
+        if d >= 0:
+            score += max(0, 16 - d) * 2
+    return flags, min(score, 0xFFFF)
+
+
+# --------------- Generation ---------------
+def build_stage(args):
+    # 1ステージ分のレコード（bytes）。ProcessPoolExecutor のワーカーで実行される
+    stage, w, h = args
+    for variant in range(MAX_VARIANTS):
+        sim = BomberSim(stage, size=(w, h), variant=variant)
+        enemy_tiles = [to_tile(e.x, e.y) for e in sim.enemies]
+        flags, score = check_layout(sim.map.cells, w, h, enemy_tiles)
+        if flags == FLAG_VALID:
+            break
+    else:
+        raise ValueError(f"stage {stage} ({w}x{h}): no valid layout in {MAX_VARIANTS} variants")
+    cap = enemy_cap(w, h)
+    table = bytearray(cap * 3)
+    for k, e in enumerate(sim.enemies[:cap]):
+        tx, ty = to_tile(e.x, e.y)
+        table[k * 3:k * 3 + 3] = bytes((tx, ty, DIRS.index((e.dirx, e.diry))))
+    head = REC_HEAD.pack(stage, score, flags, variant, min(len(sim.enemies), cap))
+    return head + bytes(sim.map.cells) + bytes(table)
+
+
+def write_bank(path, first, count, w=GRID_W, h=GRID_H, jobs=None):
+    from concurrent.futures import ProcessPoolExecutor
+    rerolled = 0
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, w, h, first, count, enemy_cap(w, h)))
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            tasks = ((s, w, h) for s in range(first, first + count))
+            for rec in pool.map(build_stage, tasks, chunksize=64):
+                rerolled += REC_HEAD.unpack_from(rec)[3] > 0
+                f.write(rec)
+    return rerolled
+
+
+# --------------- Runtime ---------------
+class StageBank:
+    def __init__(self, path):
+        self._file = open(path, "rb")
+        try:
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, version, self.w, self.h, self.first, self.count, self.enemy_cap = HEADER.unpack_from(self._mm)
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"{path}: not a Bomber stage bank (v{VERSION})")
+            self.rec_size = record_size(self.w, self.h)
+            if len(self._mm) < HEADER.size + self.count * self.rec_size:
+                raise ValueError(f"{path}: truncated stage bank")
+        except (ValueError, struct.error):
+            self._file.close()
+            raise
+
+    def close(self):
+        self._mm.close()
+        self._file.close()
+
+    def has(self, stage, w, h):
+        # 検証に通ったレコードがあるか（無ければ sim がその場で生成する）
+        return (w == self.w and h == self.h and self.first <= stage < self.first + self.count
+                and self.info(stage)[1] == FLAG_VALID)
+
+    def _offset(self, stage):
+        return HEADER.size + (stage - self.first) * self.rec_size
+
+    def info(self, stage):
+        # (score, flags, variant, n_enemies)
+        return REC_HEAD.unpack_from(self._mm, self._offset(stage))[1:]
+
+    def load(self, stage, tilemap):
+        # タイルを TileMap にコピーし、敵のリストを返す
+        off = self._offset(stage)
+        _, _, flags, _, n = REC_HEAD.unpack_from(self._mm, off)
+        if flags != FLAG_VALID:
+            raise ValueError(f"stage {stage}: bank record failed validation (flags {flags})")
+        off += REC_HEAD.size
+        size = self.w * self.h
+        tilemap.cells[:] = self._mm[off:off + size]
+        table = self._mm[off + size:off + size + n * 3]
+        enemies = []
+        for k in range(0, len(table), 3):
+            px, py = to_pix(table[k], table[k + 1])
+            enemies.append(Enemy(px, py, *DIRS[table[k + 2]]))
+        return enemies
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+    ap = argparse.ArgumentParser(description="Pre-generate and validate Bomber stages into a bank file.")
+    ap.add_argument("--out", default="bomber_stages.bin")
+    ap.add_argument("--first", type=int, default=1)
+    ap.add_argument("--count", type=int, default=1000)
+    ap.add_argument("--size", default=f"{GRID_W}x{GRID_H}", help="arena size in tiles, e.g. 63x63")
+    ap.add_argument("--jobs", type=int, default=None, help="worker processes (default: CPU count)")
+    args = ap.parse_args()
+    w, h = (int(v) for v in args.size.lower().split("x"))
+    t0 = time.perf_counter()
+    rerolled = write_bank(args.out, args.first, args.count, w, h, args.jobs)
+    dt = time.perf_counter() - t0
+    print(f"{args.count} stages ({w}x{h}) -> {args.out} in {dt:.1f}s [{rerolled} re-rolled]")
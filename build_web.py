@@ -0,0 +1,109 @@
+# Build minimal .pyxapp bundles for the Pyxel Web Launcher
+#
+# For each game only the repo modules its startup script can import are packed
+# (found with modulefinder), with comments stripped. Modules that are reachable
+# only through command-line options the launcher never passes (netplay, bots,
+# replays, the NumPy horde) are left out. Assets are copied as they are.
+#
+#   python build_web.py                    # dist/<game>.pyxapp for every game
+#   python build_web.py bomber --pyc 3.12  # also precompile to .pyc
+#
+# --pyc ships bytecode instead of source for everything but the startup script,
+# which saves Pyodide the compile step on start-up. Bytecode only loads on the
+# Python version it was compiled with, so the build refuses to run unless this
+# interpreter matches the version given (the web runtime's Python).
+
+import ast
+import os
+import py_compile
+import sys
+import zipfile
+from modulefinder import ModuleFinder
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+DIST = os.path.join(ROOT, "dist")
+
+# name: (startup script, assets（無ければ飛ばす）)
+GAMES = {
+    "bomber": ("Bomber.py", ("bomber_stages.bin",)),
+    "invader": ("invader.py", ()),
+    "pacman": ("pacman.py", ()),
+    "scroll_action": ("scroll_action.py", ()),
+}
+
+# Web Launcher からは辿れないモジュール（コマンドライン専用 / NumPy / ソケット）
+WEB_EXCLUDE = ("bomber_net", "bomber_bot", "bomber_replay", "bomber_horde", "bomber_env", "bench")
+
+# pyxel package と同じ形式（zip 内の <app>/.pyxapp_startup_script に起動スクリプト名）
+STARTUP_FILE = ".pyxapp_startup_script"
+
+
+def local_modules(script):
+    # script から import で辿れるリポジトリ内のモジュール名（script 自身は除く）
+    finder = ModuleFinder(path=[ROOT], excludes=list(WEB_EXCLUDE))
+    finder.run_script(os.path.join(ROOT, script))
+    out = []
+    for name, mod in finder.modules.items():
+        f = getattr(mod, "__file__", None)
+        if name != "__main__" and f and os.path.dirname(os.path.abspath(f)) == ROOT:
+            out.append(name)
+    return sorted(out)
+
+
+def strip_source(src):
+    # コメントと空行を落とす（ast を通すので意味は変わらない）
+    return ast.unparse(ast.parse(src)) + "\n"
+
+
+def build(name, pyc=False, out_dir=DIST):
+    # dist/<name>.pyxapp を書いて、そのパスを返す
+    script, assets = GAMES[name]
+    os.makedirs(out_dir, exist_ok=True)
+    path = os.path.join(out_dir, name + ".pyxapp")
+    tmp = os.path.join(out_dir, f".{name}.pyc.tmp")
+    with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=9) as zf:
+        zf.writestr(f"{name}/{STARTUP_FILE}", script)
+        with open(os.path.join(ROOT, script), encoding="utf-8") as f:
+            zf.writestr(f"{name}/{script}", strip_source(f.read()))
+        for mod in local_modules(script):
+            with open(os.path.join(ROOT, mod + ".py"), encoding="utf-8") as f:
+                src = strip_source(f.read())
+            if pyc:
+                # 置き場所は __pycache__ ではなく .py の代わり（ソース無しで import される）
+                with open(tmp + ".py", "w", encoding="utf-8") as f:
+                    f.write(src)
+                py_compile.compile(tmp + ".py", cfile=tmp, dfile=mod + ".py", doraise=True, optimize=2)
+                zf.write(tmp, f"{name}/{mod}.pyc")
+            else:
+                zf.writestr(f"{name}/{mod}.py", src)
+        for asset in assets:
+            src = os.path.join(ROOT, asset)
+            if not os.path.exists(src):
+                continue
+            zf.write(src, f"{name}/{asset}")
+    for f in (tmp, tmp + ".py"):
+        if os.path.exists(f):
+            os.remove(f)
+    return path
+
+
+if __name__ == "__main__":
+    import argparse
+    ap = argparse.ArgumentParser(description="Build .pyxapp bundles for the Pyxel Web Launcher.")
+    ap.add_argument("games", nargs="*", help=f"default: all of {', '.join(GAMES)}")
+    ap.add_argument("--pyc", metavar="X.Y", default=None,
+                    help="precompile modules; X.Y is the web runtime's Python and must match this interpreter")
+    ap.add_argument("--out", default=DIST)
+    args = ap.parse_args()
+    for name in args.games:
+        if name not in GAMES:
+            ap.error(f"unknown game {name!r}")
+    if args.pyc and args.pyc != "%d.%d" % sys.version_info[:2]:
+        ap.error(f"--pyc {args.pyc} needs Python {args.pyc} to build (this is {sys.version.split()[0]})")
+
+    for name in args.games or GAMES:
+        script = GAMES[name][0]
+        path = build(name, pyc=bool(args.pyc), out_dir=args.out)
+        mods = local_modules(script)
+        print(f"{os.path.relpath(path)}: {os.path.getsize(path) / 1024:.1f} KiB  ({script}"
+              + (f" + {', '.join(mods)}" if mods else "") + ")")
@@ -0,0 +1,48 @@
+# Once-per-frame input snapshot for Pyxel games
+#
+# Every bound key / gamepad button / mouse button is read exactly once per frame
+# (poll) into two bitmasks of game actions: `held` (btn) and `pressed` (btnp).
+# Game code then asks the snapshot instead of calling pyxel.btn/btnp again, and
+# the two ints are all that needs recording for a replay.
+#
+#   ACT_BOMB = 1 << 0
+#   inp = FrameInput({ACT_BOMB: (pyxel.KEY_Z, pyxel.GAMEPAD1_BUTTON_A)})
+#   inp.poll()                  # top of update()
+#   if inp.btnp(ACT_BOMB): ...
+
+import pyxel
+
+
+class FrameInput:
+    def __init__(self, bindings):
+        # bindings: {action bit: (code, ...)}。None のコード（古い Pyxel に無い定数）は無視
+        by_code = {}
+        for bit, codes in bindings.items():
+            for c in codes:
+                if c is not None:
+                    by_code[c] = by_code.get(c, 0) | bit
+        self._codes = tuple(by_code.items())
+        self.held = 0
+        self.pressed = 0
+        self.frame = 0
+
+    def poll(self):
+        held = pressed = 0
+        btn, btnp = pyxel.btn, pyxel.btnp
+        for code, mask in self._codes:
+            # btnp は押されているキーでしか真にならないので、btn が偽なら聞かない
+            if btn(code):
+                held |= mask
+                if btnp(code):
+                    pressed |= mask
+        self.held, self.pressed, self.frame = held, pressed, pyxel.frame_count
+
+    def btn(self, mask):
+        return self.held & mask != 0
+
+    def btnp(self, mask):
+        return self.pressed & mask != 0
+
+    def pressed_or_edge(self, mask, grace=3):
+        # Edge or (every few frames) held — Safari/iOS can miss btnp
+        return self.pressed & mask != 0 or (self.frame % grace == 0 and self.held & mask != 0)
@@ -0,0 +1,135 @@
+# Per-phase frame-time profiler for Pyxel games
+#
+# Each update/draw phase is timed with one perf_counter() call at its end (lap) and
+# stored in a ring buffer of the last RING frames. F3 toggles an overlay with the
+# per-phase mean / p99 and a sparkline of the frame's work time against the 60 FPS
+# budget. With FRAME_PROFILE_CSV=path in the environment the ring is written to a
+# CSV file when the game exits.
+#
+#   prof = FrameProfiler()
+#   def update(self):
+#       prof.begin()              # top of update(): starts a new frame
+#       ...; prof.lap("player")   # time since the previous lap goes to "player"
+#   def draw(self):
+#       prof.resume()             # top of draw(): skip the idle time before it
+#       ...; prof.lap("draw")
+#       prof.draw_overlay()       # last, so the overlay itself is not timed
+#
+# Nothing here needs pyxel until the overlay is drawn, so headless code (e.g.
+# BomberSim.prof) can use the same profiler.
+
+import atexit
+import os
+from array import array
+from time import perf_counter
+
+RING = 240          # frames kept (4 seconds at 60 FPS)
+BUDGET_MS = 1000 / 60
+STATS_EVERY = 15    # overlay statistics are recomputed every N frames
+
+
+class FrameProfiler:
+    def __init__(self, key="F3", csv_path=None):
+        # key: 表示切り替えのキー名（pyxel.KEY_<key>）。None なら toggle() を自分で呼ぶ
+        self.key = key
+        self.names = []    # 区間名（最初に lap された順）
+        self.rings = []    # 区間ごとの ms（array('f')、index = frame % RING）
+        self._index = {}
+        self.total = array("f", bytes(4 * RING))
+        self.frame = -1
+        self.visible = False
+        self._mark = 0.0
+        self._stats = []
+        self.csv_path = csv_path or os.environ.get("FRAME_PROFILE_CSV")
+        if self.csv_path:
+            atexit.register(self.dump)
+
+    # --------------- Timing ---------------
+    def begin(self):
+        # 前のフレームを締めて新しいフレームを始める
+        if self.key is not None:
+            import pyxel
+            if pyxel.btnp(getattr(pyxel, f"KEY_{self.key}")):
+                self.visible = not self.visible
+        if self.frame >= 0:
+            i = self.frame % RING
+            self.total[i] = sum(r[i] for r in self.rings)
+        self.frame += 1
+        i = self.frame % RING
+        for r in self.rings:
+            r[i] = 0.0
+        self._mark = perf_counter()
+
+    def resume(self):
+        self._mark = perf_counter()
+
+    def lap(self, name):
+        now = perf_counter()
+        k = self._index.get(name)
+        if k is None:
+            k = self._index[name] = len(self.names)
+            self.names.append(name)
+            self.rings.append(array("f", bytes(4 * RING)))
+        # 同じフレームで同じ区間が何度あっても足し込む
+        self.rings[k][self.frame % RING] += (now - self._mark) * 1000
+        self._mark = now
+
+    def toggle(self):
+        self.visible = not self.visible
+
+    # --------------- Statistics ---------------
+    def _frames(self):
+        # 記録済みで締まったフレームの ring index（古い順）。今のフレームと同じ枠は除く
+        n = min(self.frame, RING - 1)
+        return [(self.frame - n + k) % RING for k in range(n)]
+
+    def stats(self):
+        # [(区間名, mean ms, p99 ms), ...] と合計
+        idx = self._frames()
+        out = []
+        for name, ring in zip(self.names + ["total"], self.rings + [self.total]):
+            vals = sorted(ring[i] for i in idx)
+            if not vals:
+                out.append((name, 0.0, 0.0))
+                continue
+            p99 = vals[min(len(vals) - 1, (len(vals) * 99) // 100)]
+            out.append((name, sum(vals) / len(vals), p99))
+        return out
+
+    def dump(self, path=None):
+        path = path or self.csv_path
+        with open(path, "w") as f:
+            f.write("frame," + ",".join(f"{n}_ms" for n in self.names) + ",total_ms\n")
+            n = min(self.frame, RING - 1)
+            for k, i in enumerate(self._frames()):
+                vals = [r[i] for r in self.rings] + [self.total[i]]
+                f.write(f"{self.frame - n + k}," + ",".join(f"{v:.3f}" for v in vals) + "\n")
+
+    # --------------- Overlay ---------------
+    def draw_overlay(self, x=2, y=2):
+        if not self.visible:
+            return
+        import pyxel
+        if self.frame % STATS_EVERY == 0 or not self._stats:
+            self._stats = self.stats()
+        rows = self._stats
+        w = 104
+        spark_h = 20
+        h = (len(rows) + 1) * 7 + spark_h + 6
+        pyxel.camera()
+        pyxel.rect(x, y, w, h, 0)
+        pyxel.rectb(x, y, w, h, 5)
+        pyxel.text(x + 2, y + 2, "phase     mean   p99", 6)
+        ty = y + 9
+        for name, mean, p99 in rows:
+            pyxel.text(x + 2, ty, f"{name[:9]:<9}{mean:5.2f}{p99:6.2f}", 7 if name != "total" else 10)
+            ty += 7
+        # sparkline: 1px = 1 フレーム、高さ spark_h = 予算 2 フレーム分。予算線は spark_h / 2
+        base = ty + spark_h
+        scale = spark_h / (2 * BUDGET_MS)
+        idx = self._frames()[-(w - 4):]
+        for k, i in enumerate(idx):
+            ms = self.total[i]
+            bar = min(spark_h, max(1, int(ms * scale)))
+            pyxel.line(x + 2 + k, base, x + 2 + k, base - bar + 1, 11 if ms <= BUDGET_MS else 8)
+        pyxel.line(x + 2, base - spark_h // 2, x + w - 3, base - spark_h // 2, 5)
@@ -1,108 +1,319 @@
+import math
 import random
+import sys
 import pyxel
-from typing import List, Optional
+from array import array
+from typing import Optional
 
-class Bullet:
-    def __init__(self, x: int, y: int, dy: int):
-        self.x = x
-        self.y = y
-        self.dy = dy
+from frame_profiler import FrameProfiler
 
-    def update(self) -> bool:
-        self.y += self.dy
-        return 0 <= self.y < pyxel.height
+# リスタートは self.__init__() を呼び直すので、計測はモジュールに1つだけ持つ（F3 で表示）
+prof = FrameProfiler()
+
+ROW_POINTS = (30, 20, 10)  # 上の行から。それより下の行は最後の値
+
+# Barrier: 12x9 ピクセル、耐久 3。色は耐久値ごと（0 = 透明）
+BARRIER_W, BARRIER_H = 12, 9
+BARRIER_HP = 3
+BARRIER_COLS = (0, 8, 7, 3)
+BARRIER_IMG, BARRIER_V = 0, 0  # キャッシュ画像の置き場（イメージバンクと v）
+# 弾幕モード（Game(hell=True) / python invader.py --hell）: HELL_EVERY フレームごとに HELL_SHOOTERS 体が
+# HELL_FAN 発の扇を撃つ。自機は押しっぱなしで連射、当たり判定は機体中央の 3x3 だけ
+HELL_EVERY = 3
+HELL_SHOOTERS = 6
+HELL_FAN = tuple((1.2 * math.sin(a), 1.2 * math.cos(a)) for a in (math.radians(d) for d in range(-60, 61, 15)))
+HELL_INV = 90       # 被弾後の無敵フレーム
+ENEMY_BULLETS = 256       # 敵弾の上限（通常モード）
+ENEMY_BULLETS_HELL = 4096
+SHOTS_HELL = 32
+
+# スプライト（BARRIER_IMG の v = SPRITE_V の行に起動時に描いておく。色 0 は透明）
+SPRITE_V = 16
+INVADER_U = (0, 8)      # 行進アニメの 2 コマ（8x8）
+PLAYER_U, PLAYER_W = 16, 9
+UFO_U, UFO_W, UFO_H = 32, 16, 7  # 画面上では y - 1 から描く
+
+# 着弾点からのずれとダメージ（中心は一撃で抜け、周りは少しずつ削れる）
+CRATER = ((0, 0, 3), (-1, 0, 2), (1, 0, 2), (0, -1, 2), (0, 1, 2),
+          (-1, -1, 1), (1, -1, 1), (-1, 1, 1), (1, 1, 1), (-2, 0, 1), (2, 0, 1))
+
+def build_sprites() -> None:
+    # 旧 draw() の rect / tri / circ を一度だけイメージバンクに描く（以後は blt 1 回で済む）
+    img = pyxel.images[BARRIER_IMG]
+    v = SPRITE_V
+    img.rect(0, v, UFO_U + UFO_W, 8, 0)
+    for k, u in enumerate(INVADER_U):
+        img.rect(u + 1, v, 6, 2, 11)
+        img.rect(u, v + 2, 8, 3, 11)
+        img.rect(u + 1, v + 5, 6, 1, 11)
+        img.pset(u + 2, v + 3, 0)  # 目
+        img.pset(u + 5, v + 3, 0)
+        for lx in ((0, 7) if k == 0 else (2, 5)):  # 足（コマごとに開く / 閉じる）
+            img.rect(u + lx, v + 6, 1, 2, 11)
+    u = PLAYER_U
+    img.tri(u, v + 7, u + 4, v, u + 8, v + 7, 9)
+    img.rect(u + 2, v + 4, 4, 3, 11)
+    u = UFO_U
+    img.circ(u + 8, v + 3, 3, 8)
+    img.rect(u + 2, v + 3, 12, 2, 8)
+    img.pset(u + 7, v + 2, 10)  # 窓
+    img.pset(u + 9, v + 2, 10)
+
+class BulletPool:
+    # 固定容量の弾（x, y, dx, dy の列）。生きている弾は先頭 n 個に詰めてあり、n 以降が空き枠。
+    # 消す時は末尾の弾をその枠へ移すだけ。1 フレーム分の移動・画面外の除去・当たり判定は
+    # step() の 1 回のループでまとめて行う
+    def __init__(self, capacity: int, w: int = 1, h: int = 4) -> None:
+        self.capacity = capacity
+        self.w, self.h = w, h
+        # 列は確保済みの list（array より添字アクセスが速い。長さは変えない）
+        self.x = [0.0] * capacity
+        self.y = [0.0] * capacity
+        self.dx = [0.0] * capacity
+        self.dy = [0.0] * capacity
+        self.n = 0
+
+    def spawn(self, x: float, y: float, dx: float, dy: float) -> bool:
+        # 満杯なら撃たずに False
+        i = self.n
+        if i >= self.capacity:
+            return False
+        self.x[i], self.y[i], self.dx[i], self.dy[i] = x, y, dx, dy
+        self.n = i + 1
+        return True
+
+    def clear(self) -> None:
+        self.n = 0
+
+    def step(self, box=None, band=None, solid=None) -> int:
+        # 全弾を動かし、画面外の弾を消す。box (x0, y0, x1, y1) の内側（境界を除く）に入った弾は
+        # 消してその数を返す。solid(x, y) は整数座標で呼び、True なら弾は消える。
+        # band (top, bottom) を渡すと、その y の範囲にある弾だけ solid を呼ぶ
+        xs, ys, dxs, dys = self.x, self.y, self.dx, self.dy
+        width, height = pyxel.width, pyxel.height
+        bx0, by0, bx1, by1 = box if box else (0, 0, -1, -1)
+        top, bottom = band if band else (-(1 << 30), 1 << 30)
+        n = self.n
+        hits = 0
+        # 後ろから回すと、消した枠へ移ってくるのは処理済みの弾だけになる
+        for i in range(n - 1, -1, -1):
+            x = xs[i] + dxs[i]
+            y = ys[i] + dys[i]
+            if (0 <= y < height and 0 <= x < width
+                    and not (bx0 < x < bx1 and by0 < y < by1)
+                    and not (solid and top <= y < bottom and solid(int(x), int(y)))):
+                xs[i] = x
+                ys[i] = y
+                continue
+            if bx0 < x < bx1 and by0 < y < by1:
+                hits += 1
+            n -= 1
+            xs[i], ys[i], dxs[i], dys[i] = xs[n], ys[n], dxs[n], dys[n]
+        self.n = n
+        return hits
 
     def draw(self, color: int) -> None:
-        pyxel.rect(self.x, self.y, 1, 4, color)
+        rect, xs, ys, w, h = pyxel.rect, self.x, self.y, self.w, self.h
+        for i in range(self.n):
+            rect(xs[i], ys[i], w, h, color)
 
 class Player:
-    def __init__(self) -> None:
+    # shots: 自機弾のプール。autofire なら押しっぱなしで fire_every フレームごとに撃つ
+    def __init__(self, shots: BulletPool, autofire: bool = False, fire_every: int = 0) -> None:
         self.x = pyxel.width // 2
         self.lives = 3
-        self.bullet: Optional[Bullet] = None
+        self.inv = 0  # 被弾後の無敵フレーム（弾幕モード）
+        self.shots = shots
+        self.autofire = autofire
+        self.fire_every = fire_every
+        self.cooldown = 0
 
     def update(self) -> None:
         if pyxel.btn(pyxel.KEY_LEFT):
             self.x = max(self.x - 2, 0)
         if pyxel.btn(pyxel.KEY_RIGHT):
             self.x = min(self.x + 2, pyxel.width - 8)
-        if pyxel.btnp(pyxel.KEY_SPACE) and self.bullet is None:
-            self.bullet = Bullet(self.x + 4, pyxel.height - 10, -4)
-        if self.bullet and not self.bullet.update():
-            self.bullet = None
+        if self.inv:
+            self.inv -= 1
+        if self.cooldown:
+            self.cooldown -= 1
+        fire = pyxel.btn(pyxel.KEY_SPACE) if self.autofire else pyxel.btnp(pyxel.KEY_SPACE)
+        # 通常モードはプール容量 1 なので、画面に 1 発までは従来どおり
+        if fire and not self.cooldown and self.shots.spawn(self.x + 4, pyxel.height - 10, 0, -4):
+            self.cooldown = self.fire_every
 
     def draw(self) -> None:
-        ship_y = pyxel.height - 8
-        pyxel.tri(self.x, ship_y + 7, self.x + 4, ship_y, self.x + 8, ship_y + 7, 9)
-        pyxel.rect(self.x + 2, ship_y + 4, 4, 3, 11)
-        if self.bullet:
-            self.bullet.draw(7)
-
-class Invader:
-    def __init__(self, x: int, y: int, score: int) -> None:
-        self.x = x
-        self.y = y
-        self.score = score
-
-    def draw(self) -> None:
-        px = self.x
-        py = self.y
-        pyxel.rect(px + 1, py, 6, 2, 11)
-        pyxel.rect(px, py + 2, 8, 3, 11)
-        pyxel.rect(px + 1, py + 5, 6, 1, 11)
+        if self.inv and pyxel.frame_count % 4 < 2:
+            return
+        pyxel.blt(self.x, pyxel.height - 8, BARRIER_IMG, PLAYER_U, SPRITE_V, PLAYER_W, 8, 0)
 
 class InvaderGroup:
-    def __init__(self) -> None:
-        self.invaders: List[Invader] = []
+    # 隊列を列ごとの配列で持つ（x, y, alive, score）。隊列は形を保ったまま動くので、
+    # 各体の位置は基準位置 + 隊列オフセット (ox, oy) で、1 ステップはオフセットを足すだけ。
+    # 端と底の判定用に、生きている体がいる列・行の両端を撃破のたびに更新しておく。
+    # 弾の当たり判定は格子から列・行を割り出して O(1)。move() で格子を離れた体（loose）だけ総当たり。
+    def __init__(self, cols: int = 11, rows: int = 3, spacing=(10, 8), origin=(20, 20)) -> None:
+        self.cols, self.rows = cols, rows
+        self.sx, self.sy = spacing
+        self.x0, self.y0 = origin
+        n = cols * rows
+        self.x = array("h", [self.x0 + (i % cols) * self.sx for i in range(n)])  # 基準位置
+        self.y = array("h", [self.y0 + (i // cols) * self.sy for i in range(n)])
+        self.alive = bytearray(b"\x01" * n)
+        self.on_grid = bytearray(b"\x01" * n)  # 生きていて格子上にいる
+        self.grid_count = n
+        self.loose = set()
+        self.score = array("H", [ROW_POINTS[min(i // cols, len(ROW_POINTS) - 1)] for i in range(n)])
+        self.ox = self.oy = 0
+        self.ids = list(range(n))   # 生きている index（順不同、撃破は末尾と入れ替えて消す）
+        self._slot = list(range(n))  # index -> ids 内の位置
+        self.col_alive = array("H", [rows] * cols)
+        self.row_alive = array("H", [cols] * rows)
+        self.col_lo, self.col_hi, self.row_hi = 0, cols - 1, rows - 1
         self.dir = 1
         self.timer = 0
-        for row, points in enumerate([30, 20, 10]):
-            for col in range(11):
-                self.invaders.append(Invader(col * 10 + 20, row * 8 + 20, points))
+        self.pose = 0  # 行進アニメのコマ（1 ステップごとに切り替え）
+
+    @property
+    def count(self) -> int:
+        return len(self.ids)
 
     def update(self) -> None:
         self.timer += 1
-        speed = max(5, len(self.invaders) // 2)
-        if self.timer < speed:
+        speed = max(5, len(self.ids) // 2)
+        if self.timer < speed or not self.ids:
             return
         self.timer = 0
-        edge = False
-        for inv in self.invaders:
-            inv.x += self.dir
-            if inv.x <= 4 or inv.x >= pyxel.width - 12:
-                edge = True
-        if edge:
+        self.pose ^= 1
+        self.ox += self.dir
+        # 端は格子の両端の列と、格子を離れた体の両方から取る
+        if self.grid_count:
+            left = self.x0 + self.col_lo * self.sx
+            right = self.x0 + self.col_hi * self.sx
+        else:
+            left, right = 1 << 15, -(1 << 15)
+        for i in self.loose:
+            x = self.x[i]
+            left = min(left, x)
+            right = max(right, x)
+        if left + self.ox <= 4 or right + self.ox >= pyxel.width - 12:
             self.dir *= -1
-            for inv in self.invaders:
-                inv.y += 8
+            self.oy += 8
+
+    def kill(self, i: int) -> int:
+        # i を倒して得点を返す
+        self.alive[i] = 0
+        k = self._slot[i]
+        last = self.ids.pop()
+        if last != i:
+            self.ids[k] = last
+            self._slot[last] = k
+        if self.on_grid[i]:
+            self._leave_grid(i)
+        else:
+            self.loose.discard(i)
+        return self.score[i]
+
+    def move(self, i: int, x: int, y: int) -> None:
+        # i を隊列基準の (x, y) へ動かす（隊列から外れて飛ぶ体など）。以後は格子で引けない
+        self.x[i], self.y[i] = x, y
+        if self.on_grid[i]:
+            self._leave_grid(i)
+            self.loose.add(i)
+
+    def _leave_grid(self, i: int) -> None:
+        self.on_grid[i] = 0
+        self.grid_count -= 1
+        self.col_alive[i % self.cols] -= 1
+        self.row_alive[i // self.cols] -= 1
+        if self.grid_count:
+            while not self.col_alive[self.col_lo]:
+                self.col_lo += 1
+            while not self.col_alive[self.col_hi]:
+                self.col_hi -= 1
+            while not self.row_alive[self.row_hi]:
+                self.row_hi -= 1
+
+    def at(self, i: int):
+        return self.x[i] + self.ox, self.y[i] + self.oy
+
+    def random_shooter(self, rng=random):
+        return self.at(rng.choice(self.ids))
+
+    def hit(self, px: int, py: int) -> int:
+        # 整数の点 (px, py) を内側に含む体の index（無ければ -1。重なっていれば index の小さい方）
+        # 格子上の体 c は x0 + c*sx + ox < px < その + 8 なので、当たり得る列は下の範囲だけ
+        rx = px - self.x0 - self.ox
+        ry = py - self.y0 - self.oy
+        c0 = max(0, (rx - 8) // self.sx + 1)
+        c1 = min(self.cols - 1, (rx - 1) // self.sx)
+        r0 = max(0, (ry - 8) // self.sy + 1)
+        r1 = min(self.rows - 1, (ry - 1) // self.sy)
+        best = -1
+        on_grid = self.on_grid
+        for r in range(r0, r1 + 1):
+            base = r * self.cols
+            for c in range(c0, c1 + 1):
+                if on_grid[base + c]:
+                    best = base + c
+                    break
+            if best >= 0:
+                break
+        if self.loose:
+            ox, oy, xs, ys = self.ox, self.oy, self.x, self.y
+            for i in self.loose:
+                x, y = xs[i] + ox, ys[i] + oy
+                if x < px < x + 8 and y < py < y + 8 and (best < 0 or i < best):
+                    best = i
+        return best
+
+    def positions(self):
+        # 描画用。生きている体の (x, y)
+        ox, oy, xs, ys = self.ox, self.oy, self.x, self.y
+        for i in self.ids:
+            yield xs[i] + ox, ys[i] + oy
 
     def draw(self) -> None:
-        for inv in self.invaders:
-            inv.draw()
+        blt, u = pyxel.blt, INVADER_U[self.pose]
+        for px, py in self.positions():
+            blt(px, py, BARRIER_IMG, u, SPRITE_V, 8, 8, 0)
 
     def bottom(self) -> int:
-        return max(inv.y for inv in self.invaders) if self.invaders else 0
+        if not self.ids:
+            return 0
+        y = self.y0 + self.row_hi * self.sy if self.grid_count else -(1 << 15)
+        for i in self.loose:
+            y = max(y, self.y[i])
+        return y + self.oy
 
 class Barrier:
-    def __init__(self, x: int, y: int) -> None:
-        self.blocks = []
-        for bx in range(4):
-            for by in range(3):
-                self.blocks.append({'x': x + bx * 3, 'y': y + by * 3, 'hp': 3})
+    # ピクセルごとの耐久値（bytearray、行優先）。当たると CRATER の形に削れる。
+    # 見た目はイメージバンクの slot 番目の枠に焼いておき、削れたピクセルだけ塗り直す
+    def __init__(self, x: int, y: int, slot: int = 0) -> None:
+        self.x, self.y = x, y
+        self.u, self.v = slot * BARRIER_W, BARRIER_V
+        self.hp = bytearray([BARRIER_HP]) * (BARRIER_W * BARRIER_H)
+        img = pyxel.images[BARRIER_IMG]
+        img.rect(self.u, self.v, BARRIER_W, BARRIER_H, BARRIER_COLS[BARRIER_HP])
 
     def hit(self, x: int, y: int) -> bool:
-        for block in self.blocks:
-            if block['hp'] > 0:
-                if block['x'] <= x <= block['x'] + 2 and block['y'] <= y <= block['y'] + 2:
-                    block['hp'] -= 1
-                    return True
-        return False
+        # 整数座標 (x, y) が生きたピクセルなら削って True
+        lx, ly = x - self.x, y - self.y
+        if not (0 <= lx < BARRIER_W and 0 <= ly < BARRIER_H) or not self.hp[ly * BARRIER_W + lx]:
+            return False
+        hp = self.hp
+        pset = pyxel.images[BARRIER_IMG].pset
+        for dx, dy, dmg in CRATER:
+            px, py = lx + dx, ly + dy
+            if 0 <= px < BARRIER_W and 0 <= py < BARRIER_H:
+                i = py * BARRIER_W + px
+                if hp[i]:
+                    hp[i] = max(0, hp[i] - dmg)
+                    pset(self.u + px, self.v + py, BARRIER_COLS[hp[i]])
+        return True
 
     def draw(self) -> None:
-        for block in self.blocks:
-            if block['hp'] > 0:
-                color = 3 if block['hp'] == 3 else 7 if block['hp'] == 2 else 8
-                pyxel.rect(block['x'], block['y'], 3, 3, color)
+        pyxel.blt(self.x, self.y, BARRIER_IMG, self.u, self.v, BARRIER_W, BARRIER_H, 0)
 
 class UFO:
     def __init__(self) -> None:
@@ -119,18 +330,25 @@ class UFO:
         return -16 <= self.x <= pyxel.width
 
     def draw(self) -> None:
-        px = self.x
-        py = self.y
-        pyxel.circ(px + 8, py + 2, 3, 8)
-        pyxel.rect(px + 2, py + 2, 12, 2, 8)
+        pyxel.blt(self.x, self.y - 1, BARRIER_IMG, UFO_U, SPRITE_V, UFO_W, UFO_H, 0)
 
 class Game:
-    def __init__(self) -> None:
+    # cols x rows: 隊列の大きさ（既定は 11 x 3 = 33 体）。spacing: 隊列内の間隔 (dx, dy)
+    # hell: 弾幕モード
+    def __init__(self, cols: int = 11, rows: int = 3, spacing=(10, 8), hell: bool = False) -> None:
         pyxel.init(160, 120, title="Pyxel Invader")
-        self.player = Player()
-        self.invaders = InvaderGroup()
-        self.enemy_bullets: List[Bullet] = []
-        self.barriers = [Barrier(30, 90), Barrier(70, 90), Barrier(110, 90)]
+        self.cols, self.rows, self.spacing, self.hell = cols, rows, spacing, hell
+        build_sprites()
+        if hell:
+            self.player = Player(BulletPool(SHOTS_HELL), autofire=True, fire_every=6)
+            self.enemy_bullets = BulletPool(ENEMY_BULLETS_HELL, 2, 2)
+        else:
+            self.player = Player(BulletPool(1))
+            self.enemy_bullets = BulletPool(ENEMY_BULLETS)
+        self.invaders = InvaderGroup(cols, rows, spacing)
+        self.barriers = [Barrier(x, 90, slot) for slot, x in enumerate((30, 70, 110))]
+        # 弾がこの y の帯に無ければ Barrier を見ない
+        self.barrier_band = (min(b.y for b in self.barriers), max(b.y for b in self.barriers) + BARRIER_H)
         self.ufo: Optional[UFO] = None
         self.next_ufo = 300
         self.score = 0
@@ -138,56 +356,74 @@ class Game:
 
     # ------------------- Game Logic -------------------
     def update(self) -> None:
-        if not self.invaders.invaders or self.player.lives <= 0:
+        prof.begin()
+        if not self.invaders.count or self.player.lives <= 0:
             if pyxel.btnp(pyxel.KEY_RETURN):
-                self.__init__()
+                self.__init__(self.cols, self.rows, self.spacing, self.hell)
             return
 
         self.player.update()
+        prof.lap("player")
         self.invaders.update()
+        prof.lap("invaders")
         self.update_enemy_bullets()
+        prof.lap("bullets")
         self.handle_collisions()
+        prof.lap("collide")
         self.update_ufo()
+        prof.lap("ufo")
         if self.invaders.bottom() >= pyxel.height - 16:
             self.player.lives = 0
 
     def update_enemy_bullets(self) -> None:
-        if pyxel.frame_count % 30 == 0 and self.invaders.invaders:
-            shooter = random.choice(self.invaders.invaders)
-            self.enemy_bullets.append(Bullet(shooter.x + 4, shooter.y + 8, 3))
-        self.enemy_bullets = [b for b in self.enemy_bullets if b.update()]
+        bullets = self.enemy_bullets
+        if self.hell:
+            if pyxel.frame_count % HELL_EVERY == 0 and self.invaders.count:
+                for _ in range(HELL_SHOOTERS):
+                    x, y = self.invaders.random_shooter()
+                    for dx, dy in HELL_FAN:
+                        bullets.spawn(x + 3, y + 8, dx, dy)
+        elif pyxel.frame_count % 30 == 0 and self.invaders.count:
+            x, y = self.invaders.random_shooter()
+            bullets.spawn(x + 4, y + 8, 0, 3)
 
     def handle_collisions(self) -> None:
         # player bullet vs invader or UFO or barriers
-        if self.player.bullet:
-            b = self.player.bullet
-            for inv in self.invaders.invaders:
-                if inv.x < b.x < inv.x + 8 and inv.y < b.y < inv.y + 8:
-                    self.invaders.invaders.remove(inv)
-                    self.score += inv.score
-                    self.player.bullet = None
-                    break
-            if self.player.bullet:
-                if self.ufo and self.ufo.x < b.x < self.ufo.x + 16 and self.ufo.y < b.y < self.ufo.y + 6:
-                    self.score += 100
-                    self.ufo = None
-                    self.player.bullet = None
-            if self.player.bullet:
-                for barrier in self.barriers:
-                    if barrier.hit(b.x, b.y):
-                        self.player.bullet = None
-                        break
-
-        # enemy bullet vs player or barriers
-        for bullet in self.enemy_bullets[:]:
-            if self.player.x < bullet.x < self.player.x + 8 and pyxel.height - 8 < bullet.y < pyxel.height:
-                self.player.lives -= 1
-                self.enemy_bullets.remove(bullet)
-                continue
-            for barrier in self.barriers:
-                if barrier.hit(bullet.x, bullet.y):
-                    self.enemy_bullets.remove(bullet)
-                    break
+        self.player.shots.step(solid=self.shot_hits)
+
+        # enemy bullet vs player or barriers（自機の弾の後。バリアの削れる順は元のまま）
+        p = self.player
+        if self.hell:
+            box = None if p.inv else (p.x + 2, pyxel.height - 6, p.x + 6, pyxel.height - 2)
+        else:
+            box = (p.x, pyxel.height - 8, p.x + 8, pyxel.height)
+        hits = self.enemy_bullets.step(box, self.barrier_band, self.hit_barrier)
+        if hits:
+            if self.hell:
+                p.lives -= 1  # 弾幕モードは同じフレームに何発当たっても 1 ミス（その後は無敵）
+                p.inv = HELL_INV
+            else:
+                p.lives -= hits
+
+    def shot_hits(self, x: int, y: int) -> bool:
+        i = self.invaders.hit(x, y)
+        if i >= 0:
+            self.score += self.invaders.kill(i)
+            return True
+        if self.ufo and self.ufo.x < x < self.ufo.x + 16 and self.ufo.y < y < self.ufo.y + 6:
+            self.score += 100
+            self.ufo = None
+            return True
+        return self.hit_barrier(x, y)
+
+    def hit_barrier(self, x: int, y: int) -> bool:
+        top, bottom = self.barrier_band
+        if not top <= y < bottom:
+            return False
+        for barrier in self.barriers:
+            if barrier.hit(x, y):
+                return True
+        return False
 
     def update_ufo(self) -> None:
         if self.ufo:
@@ -200,21 +436,25 @@ class Game:
 
     # ------------------- Drawing -------------------
     def draw(self) -> None:
+        prof.resume()
         pyxel.cls(0)
         self.player.draw()
         self.invaders.draw()
-        for bullet in self.enemy_bullets:
-            bullet.draw(6)
+        self.player.shots.draw(7)
+        self.enemy_bullets.draw(6)
         for barrier in self.barriers:
             barrier.draw()
         if self.ufo:
             self.ufo.draw()
+        prof.lap("draw")
         pyxel.text(5, 5, f"Score: {self.score}", 7)
         pyxel.text(pyxel.width - 45, 5, f"Lives: {self.player.lives}", 7)
-        if self.player.lives <= 0 or not self.invaders.invaders:
+        if self.player.lives <= 0 or not self.invaders.count:
             msg = "GAME OVER" if self.player.lives <= 0 else "YOU WIN"
             pyxel.text(pyxel.width // 2 - 20, pyxel.height // 2, msg, 7)
             pyxel.text(pyxel.width // 2 - 40, pyxel.height // 2 + 10, "PRESS ENTER TO RESTART", 7)
+        prof.lap("hud")
+        prof.draw_overlay()
 
 # ★ Web用Pyxelランチャー対応：この1行だけでOK！
-Game()
+Game(hell="--hell" in sys.argv[1:])
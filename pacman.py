@@ -1,5 +1,7 @@
 import pyxel
 
+from frame_profiler import FrameProfiler
+
 TILE_SIZE = 8
 WIDTH = TILE_SIZE * 20
 HEIGHT = TILE_SIZE * 15
@@ -54,6 +56,7 @@ class Character:
 class Game:
     def __init__(self) -> None:
         pyxel.init(WIDTH, HEIGHT, title="Pyxel Pac-Man")
+        self.prof = FrameProfiler()  # F3 でフレーム時間を表示
         self.reset()
         pyxel.run(self.update, self.draw)
 
@@ -70,13 +73,18 @@ class Game:
         return '#'
 
     def update(self) -> None:
+        prof = self.prof
+        prof.begin()
         if self.game_over:
             if pyxel.btnp(pyxel.KEY_RETURN):
                 self.reset()
             return
         self.update_player()
+        prof.lap("player")
         self.update_ghost()
+        prof.lap("ghost")
         self.check_collisions()
+        prof.lap("collide")
 
     def update_player(self) -> None:
         if self.player.at_target():
@@ -126,6 +134,8 @@ class Game:
             self.game_over = True
 
     def draw(self) -> None:
+        prof = self.prof
+        prof.resume()
         pyxel.cls(0)
         for y, row in enumerate(self.board):
             for x, cell in enumerate(row):
@@ -133,12 +143,16 @@ class Game:
                     pyxel.rect(x * TILE_SIZE, y * TILE_SIZE, TILE_SIZE, TILE_SIZE, 1)
                 elif cell == '.':
                     pyxel.pset(x * TILE_SIZE + TILE_SIZE // 2, y * TILE_SIZE + TILE_SIZE // 2, 7)
+        prof.lap("board")
         pyxel.circ(self.player.x, self.player.y, 3, 10)
         pyxel.circ(self.ghost.x, self.ghost.y, 3, 8)
+        prof.lap("sprites")
         if self.game_over:
             msg = "GAME CLEAR" if self.pellets == 0 else "GAME OVER"
             pyxel.text(WIDTH // 2 - 20, HEIGHT // 2, msg, 7)
             pyxel.text(WIDTH // 2 - 40, HEIGHT // 2 + 10, "PRESS ENTER TO RESTART", 7)
+        prof.lap("hud")
+        prof.draw_overlay()
 
 if __name__ == '__main__':
     Game()
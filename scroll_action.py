@@ -2,6 +2,8 @@
 
 import pyxel
 
+from frame_profiler import FrameProfiler
+
 TILE_SIZE = 8
 WIDTH = 160
 HEIGHT = 120
@@ -113,6 +115,7 @@ class Player:
 
 class Game:
     def __init__(self):
+        self.prof = FrameProfiler()  # F3 でフレーム時間を表示
         self.reset()
 
     def reset(self):
@@ -134,19 +137,25 @@ class Game:
         self.game_over = False
 
     def update(self):
+        prof = self.prof
+        prof.begin()
         if self.win or self.game_over:
             if pyxel.btnp(pyxel.KEY_RETURN):
                 self.reset()
             return
         self.player.update()
+        prof.lap("player")
         for enemy in self.enemies:
             enemy.update()
             if abs(self.player.x - enemy.x) < PLAYER_W and abs(self.player.y - enemy.y) < PLAYER_H:
                 self.game_over = True
+        prof.lap("enemies")
         if self.player.x > LEVEL_WIDTH - 2 * TILE_SIZE:
             self.win = True
 
     def draw(self):
+        prof = self.prof
+        prof.resume()
         cam_x = max(0, min(int(self.player.x) - WIDTH // 2, LEVEL_WIDTH - WIDTH))
         pyxel.cls(6)
         for y, row in enumerate(LEVEL):
@@ -155,15 +164,19 @@ class Game:
                 py = y * TILE_SIZE
                 if tile == '#':
                     pyxel.rect(px, py, TILE_SIZE, TILE_SIZE, 3)
+        prof.lap("tiles")
         self.player.draw(cam_x)
         for enemy in self.enemies:
             enemy.draw(cam_x)
+        prof.lap("sprites")
         if self.win:
             pyxel.text(WIDTH // 2 - 20, HEIGHT // 2, "YOU WIN", 7)
             pyxel.text(WIDTH // 2 - 40, HEIGHT // 2 + 10, "PRESS ENTER TO RESTART", 7)
         if self.game_over:
             pyxel.text(WIDTH // 2 - 20, HEIGHT // 2, "GAME OVER", 7)
             pyxel.text(WIDTH // 2 - 40, HEIGHT // 2 + 10, "PRESS ENTER TO RESTART", 7)
+        prof.lap("hud")
+        prof.draw_overlay()
 
 if __name__ == "__main__":
     pyxel.init(WIDTH, HEIGHT, title="Pyxel Mario")
@@ -0,0 +1,88 @@
+# Per-frame sound scheduler for Pyxel games
+#
+# Game code queues sound ids during update(); flush() at the end of the frame
+# drops duplicates and hands the sounds out across the channels by priority, so
+# a chain reaction is one blast instead of one pyxel.play per bomb, and a new
+# sound no longer cuts off whatever was playing on channel 0.
+#
+#   audio = SoundScheduler({SND_CLEAR: 4, SND_HURT: 3, SND_BLAST: 2})
+#   audio.extend(sim.sounds)    # during update()
+#   audio.flush()               # once per frame
+#
+# A channel is free once its sound has run for its length (notes x speed from
+# pyxel.sounds), counted in pyxel.frame_count. A sound that is still playing is
+# not restarted. When every channel is busy, a sound takes the channel playing
+# the lowest-priority sound, or is dropped if nothing lower is playing.
+
+import pyxel
+
+
+class SoundScheduler:
+    def __init__(self, priority=None, channels=(0, 1, 2, 3), fps=60):
+        # priority: {sound id: 優先度（大きいほど優先）}。無いものは 0
+        self.priority = priority or {}
+        self.channels = tuple(channels)
+        self.fps = fps
+        self.frame = 0
+        self._queue = []
+        self._playing = {ch: (None, 0) for ch in self.channels}  # ch -> (sound id, 鳴り終わる frame)
+        self._length = {}
+
+    def queue(self, snd):
+        if snd not in self._queue:  # 同じフレームの重複は 1 回にまとめる
+            self._queue.append(snd)
+
+    def extend(self, sounds):
+        for snd in sounds:
+            self.queue(snd)
+
+    def length(self, snd):
+        # 1 音 = speed / 120 秒（Pyxel の仕様）をフレーム数にする
+        n = self._length.get(snd)
+        if n is None:
+            s = pyxel.sounds[snd]
+            n = self._length[snd] = max(1, -(-len(s.notes) * s.speed * self.fps // 120))
+        return n
+
+    def _pick(self, snd, prio, taken):
+        # 同じ音が鳴っている間は鳴らし直さない（None）。空き > 一番優先度の低い音（同じなら早く終わる方）
+        now = self.frame
+        free = None
+        victim = None
+        for ch in self.channels:
+            if ch in taken:
+                continue
+            cur, until = self._playing[ch]
+            if until <= now:
+                if free is None:
+                    free = ch
+                continue
+            if cur == snd:
+                return None
+            key = (self.priority.get(cur, 0), until)
+            if victim is None or key < victim[0]:
+                victim = (key, ch)
+        if free is not None:
+            return free
+        if victim is not None and victim[0][0] < prio:
+            return victim[1]
+        return None
+
+    def flush(self):
+        # フレーム末に 1 回。チャンネルごとに pyxel.play は高々 1 回
+        self.frame = pyxel.frame_count
+        if not self._queue:
+            return
+        queued = sorted(self._queue, key=lambda s: -self.priority.get(s, 0))
+        self._queue.clear()
+        taken = set()
+        for snd in queued:
+            ch = self._pick(snd, self.priority.get(snd, 0), taken)
+            if ch is None:
+                continue
+            taken.add(ch)
+            self._playing[ch] = (snd, self.frame + self.length(snd))
+            pyxel.play(ch, snd)
+
+    def clear(self):
+        self._queue.clear()